@@ -0,0 +1,92 @@
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'albums:catalog-version'
+ALBUM_VERSION_KEY = 'albums:album-version:{album_id}'
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_catalog_version():
+    """
+    Return the current catalog version token, creating one if it is missing.
+
+    Versions are timestamps rather than counters so that an evicted version key
+    can never be recreated with a value that old cached entries still use.
+    """
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def get_catalog_modified():
+    """
+    The time of the current catalog version, as an aware datetime: a bound on
+    when anything without a timestamp of its own (e.g. a genre name) last
+    changed.
+    """
+    return datetime.fromtimestamp(get_catalog_version() / 1e9, tz=timezone.utc)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every catalog payload cached under the previous version. Call it
+    once the change is committed (`transaction.on_commit`), or a concurrent
+    request can cache the old rows under the new version.
+
+    With the local-memory cache (no REDIS_URL) the version, and so the bump,
+    is per process: other workers keep serving their cached payloads until
+    CATALOG_CACHE_TIMEOUT.
+    """
+    cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def catalog_cache_key(name):
+    return f"albums:{name}:v{get_catalog_version()}"
+
+
+def get_or_set_catalog(name, builder, timeout=None):
+    """
+    Return the cached payload for `name`, calling `builder()` to build and cache
+    it when the current catalog version has no entry yet.
+    """
+    key = catalog_cache_key(name)
+    payload = cache.get(key)
+    if payload is None:
+        payload = builder()
+        cache.set(key, payload, timeout or settings.CATALOG_CACHE_TIMEOUT)
+    return payload
+
+
+def get_album_version(album_id):
+    """Version token for payloads scoped to one album (see `get_catalog_version`)."""
+    return _get_version(ALBUM_VERSION_KEY.format(album_id=album_id))
+
+
+def bump_album_version(album_id):
+    """
+    Invalidate every payload cached for `album_id` alone. Like
+    `bump_catalog_version`, call it once the change is committed.
+    """
+    cache.set(ALBUM_VERSION_KEY.format(album_id=album_id), time.time_ns(), timeout=None)
+
+
+def get_or_set_album(album_id, name, builder, timeout=None):
+    """
+    Like `get_or_set_catalog`, but keyed on the album's own version. A builder
+    returning None (e.g. for a missing album) is not cached.
+    """
+    key = f"albums:{album_id}:{name}:v{get_album_version(album_id)}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = builder()
+        if payload is not None:
+            cache.set(key, payload, timeout or settings.CATALOG_CACHE_TIMEOUT)
+    return payload
@@ -0,0 +1,85 @@
+from django.db import IntegrityError, transaction
+
+from .models import Album, Track
+from .rollups import recompute_album_rollups
+from .search import update_track_search_vectors
+from .serializers import TrackImportSerializer
+
+IMPORT_ATTEMPTS = 3
+
+
+def _number_conflicts(album, valid):
+    """
+    Split validated rows into the tracks to create and errors for rows whose
+    track number is taken, within the batch or by a track already on `album`.
+    """
+    taken = set(
+        Track.all_objects.filter(album=album, track_number__isnull=False)
+        .values_list('track_number', flat=True)
+    )
+    tracks = []
+    errors = []
+    for index, data in valid:
+        number = data.get('track_number')
+        if number is not None:
+            if number in taken:
+                errors.append({'row': index, 'errors': {'track_number': [f'Track number {number} already exists on this album.']}})
+                continue
+            taken.add(number)
+        tracks.append(Track(album=album, **data))
+    return tracks, errors
+
+
+def import_tracks(album, rows):
+    """
+    Validate and insert a batch of tracks for `album`.
+
+    Every row is validated up front; rows that fail (including duplicate track
+    numbers, within the batch or against existing tracks) are reported and
+    skipped without aborting the valid ones. Valid rows are inserted with one
+    `bulk_create` and the album rollups are recomputed once.
+
+    The album row is locked from the duplicate check to the insert, so
+    concurrent imports into one album take turns. A track saved in between by
+    other means (e.g. the admin) fails the insert on the unique track number;
+    the check is then rerun and the newly conflicting rows are reported.
+
+    Returns a tuple `(created_tracks, errors)` where `errors` is a list of
+    `{'row': index, 'errors': {...}}` dicts.
+    """
+    errors = []
+    valid = []
+    for index, row in enumerate(rows):
+        serializer = TrackImportSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({'row': index, 'errors': serializer.errors})
+
+    created = []
+    with transaction.atomic():
+        # Concurrent imports into this album wait here until this one commits.
+        Album.all_objects.select_for_update().filter(pk=album.pk).first()
+        for attempt in range(1, IMPORT_ATTEMPTS + 1):
+            tracks, conflicts = _number_conflicts(album, valid)
+            if not tracks:
+                break
+            try:
+                with transaction.atomic():
+                    created = Track.all_objects.bulk_create(tracks)
+                break
+            except IntegrityError:
+                if attempt == IMPORT_ATTEMPTS:
+                    reported = {error['row'] for error in conflicts}
+                    conflicts += [
+                        {'row': index, 'errors': {'track_number': ['Track numbers changed during the import; try again.']}}
+                        for index, _ in valid
+                        if index not in reported
+                    ]
+        errors += conflicts
+        if created:
+            update_track_search_vectors([track.id for track in created])
+            recompute_album_rollups([album.id])
+
+    errors.sort(key=lambda error: error['row'])
+    return created, errors
@@ -0,0 +1,143 @@
+"""
+Contention-free support ingestion for AlbumActivity.
+
+Contributions are applied with a single
+`INSERT ... ON CONFLICT (user_id, album_id) DO UPDATE SET amount_supported =
+amount_supported + excluded.amount_supported` statement, so the increment
+happens inside the database and concurrent writers can never lose an update.
+Each contribution also counts as a bid, so it shows up in `total_bids`,
+`current_supporters` and trending like any other.
+
+A fan's support for an album is kept in one currency. A contribution in a
+different currency from the fan's existing support is rejected, not added to
+it.
+
+The album's AlbumStats row is not updated here: every writer to a hot album
+would queue on that one row's lock. The batch appends AlbumStatsDelta rows
+instead, which `AlbumStats.fold_deltas()` adds in off the request path (see
+the `fold_album_stats` command) and `AlbumStats.with_pending()` adds on read.
+"""
+import functools
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import bump_album_version
+from .models import AlbumActivity, AlbumStatsDelta
+
+Contribution = namedtuple('Contribution', 'user_id album_id currency amount plaques')
+
+UPSERT_BATCH_SIZE = 500
+
+
+def coalesce_contributions(contributions):
+    """
+    Sum contributions per (user, album). A fan has a single AlbumActivity row
+    per album and one INSERT ... ON CONFLICT statement may touch a row only
+    once, so duplicates must be merged before writing. A duplicate in another
+    currency than the first contribution for its row is rejected instead.
+
+    Returns `(rows, rejected)`: `rows` is a list of `(contribution, positions)`
+    pairs, where `positions` are the indexes in `contributions` that were
+    merged into it, and `rejected` lists the indexes of rejected contributions.
+    """
+    merged = {}
+    rejected = []
+    for position, contribution in enumerate(contributions):
+        key = (contribution.user_id, contribution.album_id)
+        if key not in merged:
+            merged[key] = (contribution, [position])
+            continue
+        current, positions = merged[key]
+        if contribution.currency != current.currency:
+            rejected.append(position)
+            continue
+        positions.append(position)
+        merged[key] = (
+            current._replace(amount=current.amount + contribution.amount, plaques=current.plaques + contribution.plaques),
+            positions,
+        )
+    # Fixed key order keeps concurrent batches from deadlocking on each other.
+    return [merged[key] for key in sorted(merged)], rejected
+
+
+def _upsert_sql(rows):
+    quote = connection.ops.quote_name
+    table = quote(AlbumActivity._meta.db_table)
+    columns = [
+        'user_id', 'album_id', 'currency', 'amount_supported', 'plaque_count', 'liked', 'bid_amount', 'bid_date',
+        'updated_at',
+    ]
+    placeholders = ', '.join(['(%s)' % ', '.join(['%s'] * len(columns))] * rows)
+    return (
+        f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+        f"VALUES {placeholders} "
+        f"ON CONFLICT ({quote('user_id')}, {quote('album_id')}) DO UPDATE SET "
+        f"{quote('currency')} = excluded.{quote('currency')}, "
+        f"{quote('amount_supported')} = {table}.{quote('amount_supported')} + excluded.{quote('amount_supported')}, "
+        f"{quote('plaque_count')} = {table}.{quote('plaque_count')} + excluded.{quote('plaque_count')}, "
+        f"{quote('bid_amount')} = COALESCE({table}.{quote('bid_amount')}, 0) + excluded.{quote('bid_amount')}, "
+        f"{quote('bid_date')} = excluded.{quote('bid_date')}, "
+        f"{quote('updated_at')} = excluded.{quote('updated_at')} "
+        # Rows holding support in another currency are left alone and, having
+        # no RETURNING row, reported as rejected. A row with no support yet
+        # (e.g. only a like) takes the contribution's currency.
+        f"WHERE {table}.{quote('currency')} = excluded.{quote('currency')} "
+        f"OR {table}.{quote('amount_supported')} = 0 "
+        f"RETURNING {quote('user_id')}, {quote('album_id')}, {quote('bid_amount')}"
+    )
+
+
+def ingest_contributions(contributions, batch_size=UPSERT_BATCH_SIZE):
+    """
+    Add a batch of `Contribution`s to AlbumActivity with atomic upserts and
+    record the matching AlbumStatsDelta rows. Returns the sorted indexes in
+    `contributions` that were rejected because they do not match the
+    currency of the fan's existing support for the album.
+
+    The raw upsert bypasses model signals, so the stats deltas and the
+    supporter leaderboard cache are maintained here instead.
+    """
+    rows, rejected = coalesce_contributions(contributions)
+    if not rows:
+        return sorted(rejected)
+
+    now = timezone.now()
+    deltas = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = []
+            for row, _ in batch:
+                params.extend([
+                    row.user_id, row.album_id, row.currency, row.amount, row.plaques, False, row.amount, now, now,
+                ])
+            cursor.execute(_upsert_sql(len(batch)), params)
+            written = {(user_id, album_id): bid_amount for user_id, album_id, bid_amount in cursor.fetchall()}
+            for row, positions in batch:
+                key = (row.user_id, row.album_id)
+                if key not in written:
+                    rejected.extend(positions)
+                    continue
+                usd, zig, bids = deltas.get(row.album_id, (Decimal(0), Decimal(0), 0))
+                if row.currency == 'USD':
+                    usd += row.amount
+                elif row.currency == 'ZWL':
+                    zig += row.amount
+                # The bid total equals this batch's amount only when the row
+                # had no bid before, i.e. the fan just became a supporter.
+                if Decimal(str(written[key])) == row.amount:
+                    bids += 1
+                deltas[row.album_id] = (usd, zig, bids)
+
+        AlbumStatsDelta.objects.bulk_create([
+            AlbumStatsDelta(album_id=album_id, usd_support=usd, zig_support=zig, total_bids=bids)
+            for album_id, (usd, zig, bids) in sorted(deltas.items())
+        ])
+
+    for album_id in deltas:
+        # Runs at once unless the caller holds a transaction open.
+        transaction.on_commit(functools.partial(bump_album_version, album_id))
+    return sorted(rejected)
@@ -0,0 +1,45 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from albums.models import AlbumStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold pending AlbumStatsDelta rows written by support ingestion into the AlbumStats rows. "
+        "Safe to run several workers at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Fold pending deltas once and exit.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when nothing is pending.")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        total = 0
+        while not self.stopping:
+            close_old_connections()
+            folded = AlbumStats.fold_deltas(options['batch_size'])
+            total += folded
+            if folded:
+                continue
+            if options['once']:
+                break
+            self.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {total} stats delta(s) folded."))
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(min(0.5, deadline - time.monotonic()))
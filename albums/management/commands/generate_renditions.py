@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from albums.models import Album, Track
+from backend.renditions import generate_renditions, record_renditions
+
+
+class Command(BaseCommand):
+    help = "Generate image renditions for existing album covers, track art and profile images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only', choices=['albums', 'tracks', 'users'], action='append',
+            help="Restrict to these sources (repeatable; default: all).",
+        )
+
+    def handle(self, *args, **options):
+        sources = {
+            'albums': (Album, ['cover_art']),
+            'tracks': (Track, ['track_art']),
+            'users': (get_user_model(), ['profile_pic', 'cover_photo']),
+        }
+        for key in options['only'] or sources:
+            model, field_names = sources[key]
+            rendered = failed = 0
+            for instance in model._base_manager.only('pk', *field_names).iterator(chunk_size=200):
+                done = {}
+                for field_name in field_names:
+                    fieldfile = getattr(instance, field_name)
+                    if not fieldfile:
+                        continue
+                    try:
+                        generate_renditions(fieldfile)
+                        done[field_name] = fieldfile.name
+                        rendered += 1
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f"{model.__name__} {instance.pk} {field_name}: {e}")
+                if done:
+                    # Serializers only advertise renditions once recorded.
+                    record_renditions(model, instance.pk, done)
+            self.stdout.write(self.style.SUCCESS(f"{key}: rendered {rendered} image(s), {failed} failed."))
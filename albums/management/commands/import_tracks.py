@@ -0,0 +1,51 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from albums.importers import import_tracks
+from albums.models import Album
+
+
+class Command(BaseCommand):
+    help = "Bulk-import tracks for an album from a CSV or JSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('album_id', type=int)
+        parser.add_argument('path', help="CSV file with a header row, or a JSON list of track objects.")
+        parser.add_argument('--format', choices=['csv', 'json'], help="Defaults to the file extension.")
+
+    def handle(self, *args, **options):
+        try:
+            album = Album.all_objects.get(id=options['album_id'])
+        except Album.DoesNotExist:
+            raise CommandError(f"Album {options['album_id']} does not exist.")
+
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        rows = self.read_rows(path, file_format)
+
+        created, errors = import_tracks(album, rows)
+        for error in errors:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(created)} track(s) into '{album.title}', {len(errors)} row(s) rejected."
+        ))
+
+    def read_rows(self, path, file_format):
+        with path.open(newline='', encoding='utf-8') as handle:
+            if file_format == 'json':
+                rows = json.load(handle)
+                if not isinstance(rows, list):
+                    raise CommandError("JSON input must be a list of track objects.")
+                return rows
+            if file_format == 'csv':
+                # Empty CSV cells mean "not provided", not an empty string.
+                return [
+                    {key: value for key, value in row.items() if value not in ('', None)}
+                    for row in csv.DictReader(handle)
+                ]
+        raise CommandError(f"Unsupported format: {file_format}")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from albums.models import AlbumStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized AlbumStats rows from AlbumActivity."
+
+    def add_arguments(self, parser):
+        parser.add_argument('album_ids', nargs='*', type=int, help="Only rebuild these albums (default: all).")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        written = AlbumStats.rebuild(
+            album_ids=options['album_ids'] or None,
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {written} album(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from albums.search import update_album_search_vectors, update_track_search_vectors, uses_full_text_search
+
+
+class Command(BaseCommand):
+    help = "Recompute the full-text search vectors for all albums and tracks (PostgreSQL only)."
+
+    def handle(self, *args, **options):
+        if not uses_full_text_search():
+            self.stdout.write("Full-text search vectors are only maintained on PostgreSQL; nothing to do.")
+            return
+        albums = update_album_search_vectors()
+        tracks = update_track_search_vectors()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {albums} album(s) and {tracks} track(s)."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from albums.tiers import RECLASSIFY_BATCH_SIZE, reclassify_payments, reclassify_plaques
+
+
+class Command(BaseCommand):
+    help = "Re-apply the plaque tier table to stored Payment and Plaque rows with set-based UPDATEs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=['payments', 'plaques'], help="Limit to one table.")
+        parser.add_argument('--batch-size', type=int, default=RECLASSIFY_BATCH_SIZE, help="Rows per UPDATE statement.")
+
+    def handle(self, *args, **options):
+        only = options['only']
+        if only in (None, 'payments'):
+            updated = reclassify_payments(batch_size=options['batch_size'])
+            self.stdout.write(f"Payments reclassified: {updated}")
+        if only in (None, 'plaques'):
+            updated = reclassify_plaques(batch_size=options['batch_size'])
+            self.stdout.write(f"Plaques reclassified: {updated}")
+        self.stdout.write(self.style.SUCCESS("Plaque tiers are up to date."))
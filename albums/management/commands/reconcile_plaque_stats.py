@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from albums.models import UserPlaqueSummary
+
+
+class Command(BaseCommand):
+    help = "Repair drifted UserPlaqueSummary rows by recomputing them from PlaquePurchase."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fan_ids', nargs='*', type=int, help="Only reconcile these users (default: all).")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        repaired = UserPlaqueSummary.rebuild(
+            fan_ids=options['fan_ids'] or None,
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} plaque summary row(s)."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from albums.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = "Refresh the trending-albums leaderboard from activity since the last watermark."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Rebuild the whole table from the trending window instead of applying new activity.",
+        )
+
+    def handle(self, *args, **options):
+        touched = refresh_trending(full=options['full'])
+        mode = "Rebuilt" if options['full'] else "Refreshed"
+        self.stdout.write(self.style.SUCCESS(f"{mode} trending scores; {touched} album(s) rescored."))
@@ -0,0 +1,73 @@
+"""
+Bulk plaque minting.
+
+Mints a batch of plaques, e.g. for a cash-collection event, with hash keys
+generated up front in Python and two `bulk_create` statements: one for the
+Plaque rows and one for their PlaquePurchase rows.
+"""
+import uuid
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Album, Plaque, PlaquePurchase, UserPlaqueSummary
+from .tiers import plaque_type_for_amount
+from .utils import generate_plaque_hashes
+
+PlaqueOrder = namedtuple('PlaqueOrder', 'fan_id album_id amount transaction_id', defaults=(None,))
+
+MINT_BATCH_SIZE = 500
+
+
+def missing_references(orders):
+    """
+    Return `(missing_fan_ids, missing_album_ids)` for the orders, checked with
+    one query per table. Only live albums can be supported.
+    """
+    fan_ids = {order.fan_id for order in orders}
+    album_ids = {order.album_id for order in orders}
+    found_fans = set(get_user_model().objects.filter(id__in=fan_ids).values_list('id', flat=True))
+    found_albums = set(Album.objects.filter(id__in=album_ids).values_list('id', flat=True))
+    return sorted(fan_ids - found_fans), sorted(album_ids - found_albums)
+
+
+def mint_plaques(orders, payment_status='pending', payment_method=None, batch_size=MINT_BATCH_SIZE):
+    """
+    Create one Plaque and its PlaquePurchase per `PlaqueOrder`, atomically.
+
+    Returns the new PlaquePurchase instances, in order, each with its
+    `plaque` attached, so callers can read the minted hash keys without
+    further queries.
+    """
+    orders = list(orders)
+    if not orders:
+        return []
+
+    plaque_keys = generate_plaque_hashes([(order.fan_id, order.album_id) for order in orders])
+    plaques = [
+        Plaque(plaque_type=plaque_type_for_amount(order.amount), hash_key=key)
+        for order, key in zip(orders, plaque_keys)
+    ]
+    purchases = [
+        PlaquePurchase(
+            plaque=plaque,
+            fan_id=order.fan_id,
+            album_supported_id=order.album_id,
+            hash_key=str(uuid.uuid4()),
+            contribution_amount=order.amount,
+            payment_status=payment_status,
+            payment_method=payment_method,
+            transaction_id=order.transaction_id or str(uuid.uuid4()),
+        )
+        for order, plaque in zip(orders, plaques)
+    ]
+
+    with transaction.atomic():
+        # PostgreSQL and SQLite both return primary keys from bulk_create, so
+        # the purchases pick up the ids of the plaques just inserted.
+        Plaque.objects.bulk_create(plaques, batch_size=batch_size)
+        PlaquePurchase.objects.bulk_create(purchases, batch_size=batch_size)
+        # bulk_create skips post_save, so refresh the affected fans' summaries here.
+        UserPlaqueSummary.rebuild(fan_ids={order.fan_id for order in orders})
+    return purchases
@@ -1,7 +1,11 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
-from .utils import generate_purchase_hash
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
+from .utils import generate_plaque_hashes
+from .tiers import plaque_type_for_amount
 
 
 class Genre(models.Model):
@@ -10,6 +14,18 @@ class Genre(models.Model):
     def __str__(self):
         return self.name
 
+class LiveAlbumManager(models.Manager):
+    """Albums visible to the public: published and not soft-deleted."""
+    def get_queryset(self):
+        return super().get_queryset().filter(is_published=True, is_deleted=False)
+
+
+class LiveTrackManager(models.Manager):
+    """Tracks visible to the public: published and not soft-deleted."""
+    def get_queryset(self):
+        return super().get_queryset().filter(is_published=True, is_deleted=False)
+
+
 class Album(models.Model):
     artist = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='albums')
     title = models.CharField(max_length=255)
@@ -28,6 +44,28 @@ class Album(models.Model):
     is_deleted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by albums.search on PostgreSQL; unused on other databases.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Image field -> file name whose renditions exist; see backend.renditions.
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+
+    # `objects` only sees live albums. Admin, artist tooling and maintenance
+    # code use `all_objects`, which is also the default manager so that model
+    # validation, related managers and dumpdata still see every row.
+    all_objects = models.Manager()
+    objects = LiveAlbumManager()
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        indexes = [
+            # Public catalog ordering/cursor pagination, over live rows only.
+            models.Index(
+                fields=['release_date', 'id'],
+                condition=models.Q(is_published=True, is_deleted=False),
+                name='album_live_release_idx',
+            ),
+            GinIndex(fields=['search_vector']),
+        ]
 
     def __str__(self):
         return self.title
@@ -54,18 +92,206 @@ class AlbumActivity(models.Model):
     album = models.ForeignKey('Album', on_delete=models.CASCADE, related_name='activities')
     liked = models.BooleanField(default=False)
     bid_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Time of the latest bid; trending ages the supporter weight from it.
     bid_date = models.DateTimeField(auto_now_add=True)
+    # Last time the fan's support or like changed: the trending refresh
+    # watermark, and what a like is aged from.
+    updated_at = models.DateTimeField(auto_now=True)
     currency = models.CharField(max_length=3, choices=[('USD', 'USD'), ('ZWL', 'ZWL')])
    # amount_supported = models.DecimalField(max_digits=10, decimal_places=2)
     plaque_count = models.PositiveBigIntegerField(default=0)
     amount_supported = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
+    # Fields that feed AlbumStats; their loaded values are kept so that saves
+    # can be applied to the stats row as deltas.
+    STATS_FIELDS = ('currency', 'amount_supported', 'bid_amount')
+
     class Meta:
         unique_together = ('user', 'album')
+        indexes = [
+            # Supporter leaderboard: RANK() OVER (PARTITION BY album ORDER BY amount_supported DESC).
+            models.Index(fields=['album', '-amount_supported'], name='albumactivity_album_amount_idx'),
+            # Trending refresh: activity changed since the last watermark.
+            models.Index(fields=['updated_at'], name='albumactivity_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} on {self.album.title} (Liked: {self.liked}, Bid: {self.bid_amount})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(field in loaded for field in cls.STATS_FIELDS):
+            instance._loaded_stats = {field: loaded[field] for field in cls.STATS_FIELDS}
+        return instance
+
+    def stats_snapshot(self):
+        return {field: getattr(self, field) for field in self.STATS_FIELDS}
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_stats', None)
+        if loaded is not None and self.bid_amount is not None and self.bid_amount != loaded['bid_amount']:
+            self.bid_date = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'bid_date', 'updated_at'}
+        super().save(*args, **kwargs)
+
+
+class AlbumStats(models.Model):
+    """
+    Denormalized support totals for one album, kept in step with AlbumActivity
+    by F() increments so AlbumStatisticsView can serve from a single row.
+
+    Bulk support ingestion does not touch this row; it appends
+    AlbumStatsDelta rows instead, which `fold_deltas()` adds in later and
+    `with_pending()` adds on read.
+    """
+    album = models.OneToOneField(Album, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    usd_support = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    zig_support = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_bids = models.PositiveIntegerField(default=0)
+    current_supporters = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for album {self.album_id}"
+
+    @classmethod
+    def apply_delta(cls, album_id, usd=0, zig=0, bids=0, rebuild_missing=True):
+        """Atomically add the given deltas to an album's stats row."""
+        if not (usd or zig or bids):
+            return
+        updated = cls.objects.filter(album_id=album_id).update(
+            usd_support=models.F('usd_support') + usd,
+            zig_support=models.F('zig_support') + zig,
+            total_bids=models.F('total_bids') + bids,
+            current_supporters=models.F('current_supporters') + bids,
+            updated_at=timezone.now(),
+        )
+        if not updated and rebuild_missing:
+            # No row yet: the aggregate already includes the change being applied.
+            cls.rebuild(album_ids=[album_id])
+
+    @staticmethod
+    def _pending(field, album_ref='album_id'):
+        """Subquery summing `field` over an album's unfolded AlbumStatsDelta rows."""
+        return models.Subquery(
+            AlbumStatsDelta.objects.filter(album_id=models.OuterRef(album_ref))
+            .order_by()
+            .values('album_id')
+            .annotate(total=models.Sum(field))
+            .values('total')
+        )
+
+    @classmethod
+    def with_pending(cls):
+        """
+        Stats rows annotated with their albums' unfolded deltas, read in the
+        same statement so a concurrent fold is never counted twice or missed.
+        """
+        return cls.objects.annotate(
+            pending_usd=cls._pending('usd_support'),
+            pending_zig=cls._pending('zig_support'),
+            pending_bids=cls._pending('total_bids'),
+        )
+
+    @classmethod
+    def fold_deltas(cls, batch_size=1000):
+        """
+        Add up to `batch_size` pending AlbumStatsDelta rows into their stats
+        rows and delete them, one UPDATE per album. Returns how many deltas
+        were folded. Safe to run from several workers at once.
+        """
+        with transaction.atomic():
+            deltas = list(
+                AlbumStatsDelta.objects.select_for_update(skip_locked=True)
+                .order_by('id')
+                .values_list('id', 'album_id', 'usd_support', 'zig_support', 'total_bids')[:batch_size]
+            )
+            if not deltas:
+                return 0
+            totals = {}
+            for _, album_id, usd, zig, bids in deltas:
+                album_usd, album_zig, album_bids = totals.get(album_id, (0, 0, 0))
+                totals[album_id] = (album_usd + usd, album_zig + zig, album_bids + bids)
+            # Deleted first, so a stats row rebuilt by apply_delta does not
+            # subtract the deltas being folded into it.
+            AlbumStatsDelta.objects.filter(id__in=[delta[0] for delta in deltas]).delete()
+            # Fixed album order keeps concurrent folds from deadlocking.
+            for album_id, (usd, zig, bids) in sorted(totals.items()):
+                cls.apply_delta(album_id, usd=usd, zig=zig, bids=bids)
+        return len(deltas)
+
+    @classmethod
+    def rebuild(cls, album_ids=None, batch_size=500):
+        """
+        Recompute stats rows from AlbumActivity in one grouped query per batch
+        of albums. Rebuilds every album when `album_ids` is None. Returns the
+        number of rows written.
+
+        Pending AlbumStatsDelta rows are subtracted in the same query, since
+        the activity totals already include them and they are folded in later.
+        """
+        albums = Album.all_objects.all()
+        if album_ids is not None:
+            albums = albums.filter(id__in=album_ids)
+        album_ids = list(albums.values_list('id', flat=True).order_by('id'))
+        written = 0
+        for start in range(0, len(album_ids), batch_size):
+            batch = album_ids[start:start + batch_size]
+            supporting = models.Q(activities__bid_amount__isnull=False)
+            totals = {
+                row['id']: row
+                for row in Album.all_objects.filter(id__in=batch)
+                .order_by()
+                .values('id')
+                .annotate(
+                    usd=models.Sum('activities__amount_supported', filter=models.Q(activities__currency='USD')),
+                    zig=models.Sum('activities__amount_supported', filter=models.Q(activities__currency='ZWL')),
+                    bids=models.Count('activities', filter=supporting),
+                    supporters=models.Count('activities__user', filter=supporting, distinct=True),
+                    pending_usd=cls._pending('usd_support', 'id'),
+                    pending_zig=cls._pending('zig_support', 'id'),
+                    pending_bids=cls._pending('total_bids', 'id'),
+                )
+            }
+            now = timezone.now()
+            rows = []
+            for album_id in batch:
+                row = totals.get(album_id, {})
+                rows.append(cls(
+                    album_id=album_id,
+                    usd_support=(row.get('usd') or 0) - (row.get('pending_usd') or 0),
+                    zig_support=(row.get('zig') or 0) - (row.get('pending_zig') or 0),
+                    total_bids=(row.get('bids') or 0) - (row.get('pending_bids') or 0),
+                    current_supporters=(row.get('supporters') or 0) - (row.get('pending_bids') or 0),
+                    updated_at=now,
+                ))
+            cls.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['album'],
+                update_fields=['usd_support', 'zig_support', 'total_bids', 'current_supporters', 'updated_at'],
+            )
+            written += len(rows)
+        return written
+
+class AlbumStatsDelta(models.Model):
+    """
+    A change to an album's AlbumStats not yet folded into its row. Support
+    ingestion appends these instead of updating the single stats row, so
+    concurrent writers to a hot album never queue on its lock.
+    """
+    album = models.ForeignKey(Album, on_delete=models.CASCADE, related_name='+')
+    usd_support = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    zig_support = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_bids = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Pending stats change for album {self.album_id}"
+
 class Track(models.Model):
     album = models.ForeignKey(Album, on_delete=models.CASCADE, related_name='tracks')
     title = models.CharField(max_length=255)
@@ -85,10 +311,27 @@ class Track(models.Model):
     writer = models.CharField(max_length=255, blank=True, null=True)
     is_published = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)
+    # Maintained by albums.search on PostgreSQL; unused on other databases.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Image field -> file name whose renditions exist; see backend.renditions.
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+
+    # See Album: `objects` is live-only, `all_objects` is the default manager.
+    all_objects = models.Manager()
+    objects = LiveTrackManager()
 
     class Meta:
         ordering = ['track_number']
         unique_together = ('album', 'track_number')
+        default_manager_name = 'all_objects'
+        indexes = [
+            models.Index(
+                fields=['album', 'track_number'],
+                condition=models.Q(is_deleted=False),
+                name='track_live_album_number_idx',
+            ),
+            GinIndex(fields=['search_vector']),
+        ]
 
     def __str__(self):
         return f"{self.track_number}. {self.title}" if self.track_number else f"Untitled Track: {self.title}"
@@ -107,12 +350,9 @@ class Plaque(models.Model):
     hash_key = models.CharField(max_length=100, unique=True, blank=True)
 
     def save(self, *args, **kwargs):
-        if not self.hash_key: 
-            self.hash_key = generate_purchase_hash(
-                self.fan_id,
-                self.plaque_id,
-                self.album_id
-            )
+        if not self.hash_key:
+            # A bare plaque has no fan or album yet; see generate_plaque_hashes.
+            self.hash_key = generate_plaque_hashes([(None, None)])[0]
         super().save(*args, **kwargs)
     def __str__(self):
         return f"{self.plaque_type} Plaque - Hash: {self.hash_key}"
@@ -131,27 +371,154 @@ class PlaquePurchase(models.Model):
     payment_method = models.CharField(max_length=50, blank=True, null=True)
     transaction_id = models.CharField(max_length=100)
 
+    # Fields that feed UserPlaqueSummary; their loaded values are kept so that
+    # saves can be applied to the summary row as deltas.
+    SUMMARY_FIELDS = ('fan_id', 'album_supported_id', 'payment_status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(field in loaded for field in cls.SUMMARY_FIELDS):
+            instance._loaded_summary = {field: loaded[field] for field in cls.SUMMARY_FIELDS}
+        return instance
+
+    def summary_snapshot(self):
+        return {field: getattr(self, field) for field in self.SUMMARY_FIELDS}
+
     def save(self, *args, **kwargs):
-        self.plaque.plaque_type = self.get_plaque_type(self.contribution_amount)
-        self.plaque.save()
+        plaque_type = self.get_plaque_type(self.contribution_amount)
+        if self.plaque.plaque_type != plaque_type:
+            self.plaque.plaque_type = plaque_type
+            self.plaque.save(update_fields=['plaque_type'])
         super().save(*args, **kwargs)
 
     def get_plaque_type(self, amount):
-        if amount < 51:
-            return 'thank_you'
-        elif 51 <= amount <= 100:
-            return 'wood'
-        elif 101 <= amount <= 300:
-            return 'ruby'
-        elif 301 <= amount <= 500:
-            return 'bronze'
-        elif 501 <= amount <= 700:
-            return 'silver'
-        elif 701 <= amount <= 900:
-            return 'gold'
-        else:
-            return 'emerald'
+        return plaque_type_for_amount(amount)
 
     def __str__(self):
         return f"Purchase Details for {self.plaque} - Hash Key: {self.hash_key}"
 
+
+
+class TrendingAlbum(models.Model):
+    """
+    Materialized "Trending" ranking. `score` is the time-decayed support an
+    album has received, expressed as of `scored_at`; see albums.trending.
+    """
+    album = models.OneToOneField(Album, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField(default=0)
+    scored_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score']),
+        ]
+
+    def __str__(self):
+        return f"Trending score {self.score:.2f} for album {self.album_id}"
+
+
+class TrendingWatermark(models.Model):
+    """
+    Single row recording how far the trending refresh has consumed activity:
+    purchases up to `last_purchase_id`, AlbumActivity changes up to
+    `refreshed_at`.
+    """
+    last_purchase_id = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Trending watermark at {self.refreshed_at}"
+
+
+class UserPlaqueSummary(models.Model):
+    """
+    Per-fan plaque purchase counters, kept in step with PlaquePurchase on
+    write so the dashboard reads them with one primary-key lookup.
+    """
+    fan = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='plaque_summary')
+    total = models.PositiveIntegerField(default=0)
+    purchased = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    albums_supported = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTER_FIELDS = ('total', 'purchased', 'pending', 'albums_supported')
+
+    def __str__(self):
+        return f"Plaque summary for user {self.fan_id}"
+
+    @staticmethod
+    def aggregate_for(fan_ids):
+        """
+        Compute counters straight from PlaquePurchase with conditional counts,
+        in one grouped query. Returns `{fan_id: {counter: value}}`.
+        """
+        return {
+            row.pop('fan_id'): row
+            for row in PlaquePurchase.objects.filter(fan_id__in=fan_ids)
+            .order_by()
+            .values('fan_id')
+            .annotate(
+                total=models.Count('id'),
+                purchased=models.Count('id', filter=models.Q(payment_status='completed')),
+                pending=models.Count('id', filter=models.Q(payment_status='pending')),
+                albums_supported=models.Count('album_supported', distinct=True),
+            )
+        }
+
+    @classmethod
+    def for_fan(cls, fan_id):
+        """Return the fan's counters as a dict, building the row if it is missing."""
+        row = cls.objects.filter(fan_id=fan_id).values(*cls.COUNTER_FIELDS).first()
+        if row is None:
+            cls.rebuild(fan_ids=[fan_id])
+            row = cls.objects.filter(fan_id=fan_id).values(*cls.COUNTER_FIELDS).first()
+        return row
+
+    @classmethod
+    def apply_delta(cls, fan_id, rebuild_missing=True, **deltas):
+        """Atomically add the given counter deltas to a fan's summary row."""
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        updated = cls.objects.filter(fan_id=fan_id).update(
+            updated_at=timezone.now(),
+            **{field: models.F(field) + delta for field, delta in deltas.items()},
+        )
+        if not updated and rebuild_missing:
+            # No row yet: the aggregate already includes the change being applied.
+            cls.rebuild(fan_ids=[fan_id])
+
+    @classmethod
+    def rebuild(cls, fan_ids=None, batch_size=500):
+        """
+        Recompute summary rows from PlaquePurchase, one grouped query per batch
+        of fans. With `fan_ids=None`, every fan that has purchases or an
+        existing row is rebuilt. Returns the number of rows whose stored
+        counters were wrong or missing.
+        """
+        if fan_ids is None:
+            fan_ids = set(PlaquePurchase.objects.order_by().values_list('fan_id', flat=True).distinct())
+            fan_ids.update(cls.objects.values_list('fan_id', flat=True))
+        fan_ids = sorted(fan_ids)
+        drifted = 0
+        for start in range(0, len(fan_ids), batch_size):
+            batch = fan_ids[start:start + batch_size]
+            actual = cls.aggregate_for(batch)
+            stored = {row.pop('fan_id'): row for row in cls.objects.filter(fan_id__in=batch).values('fan_id', *cls.COUNTER_FIELDS)}
+            now = timezone.now()
+            rows = []
+            for fan_id in batch:
+                counters = actual.get(fan_id, dict.fromkeys(cls.COUNTER_FIELDS, 0))
+                if stored.get(fan_id) != counters:
+                    drifted += 1
+                    rows.append(cls(fan_id=fan_id, updated_at=now, **counters))
+            cls.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['fan'],
+                update_fields=[*cls.COUNTER_FIELDS, 'updated_at'],
+            )
+        return drifted
@@ -0,0 +1,169 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination, _reverse_ordering
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the public catalog.
+
+    DRF's CursorPagination only filters on the first ordering field and steps
+    over rows tied on it with an OFFSET. Here the cursor holds the value of
+    every ordering field of the last row served, and the next page starts
+    strictly after that row in the full ordering. With a unique ordering
+    (ending in `id`) every page is a single indexed range scan regardless of
+    how deep the client has scrolled.
+
+    NULLs in a nullable ordering field sort as larger than every value (last
+    ascending, first descending) on every database, and the cursor compares
+    them explicitly, since `field > NULL` matches nothing.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self._decode_position(queryset.model) if self.cursor else None
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*self._order_by(queryset.model, ordering))
+        if position is not None:
+            queryset = queryset.filter(self._after(queryset.model, ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = bool(self.page), has_following
+        else:
+            self.has_next, self.has_previous = has_following, position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _decode_position(self, model):
+        if self.cursor.position is None:
+            return None
+        try:
+            values = json.loads(self.cursor.position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            # Reject malformed values here rather than as a database error.
+            return [
+                model._meta.get_field(order.lstrip('-')).to_python(value)
+                for order, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _order_by(model, ordering):
+        expressions = []
+        for order in ordering:
+            field = order.lstrip('-')
+            if not model._meta.get_field(field).null:
+                expressions.append(order)
+            elif order.startswith('-'):
+                expressions.append(F(field).desc(nulls_first=True))
+            else:
+                expressions.append(F(field).asc(nulls_last=True))
+        return expressions
+
+    @staticmethod
+    def _beyond(field, descending, value, nullable, inclusive=False):
+        """Rows whose `field` comes after `value` (or equals it, if `inclusive`)."""
+        if value is None:
+            # NULL is the largest value: descending, every non-null follows it.
+            following = Q(**{f'{field}__isnull': False}) if descending else Q(pk__in=[])
+            return following | Q(**{f'{field}__isnull': True}) if inclusive else following
+        lookup = ('lt' if descending else 'gt') + ('e' if inclusive else '')
+        following = Q(**{f'{field}__{lookup}': value})
+        if nullable and not descending:
+            following |= Q(**{f'{field}__isnull': True})
+        return following
+
+    @classmethod
+    def _after(cls, model, ordering, position):
+        """Rows strictly after `position` in `ordering`, as a row-value comparison."""
+        condition = Q()
+        equal = Q()
+        for order, value in zip(ordering, position):
+            field = order.lstrip('-')
+            nullable = model._meta.get_field(field).null
+            condition |= equal & cls._beyond(field, order.startswith('-'), value, nullable)
+            equal &= Q(**{f'{field}__isnull': True}) if value is None else Q(**{field: value})
+        # The bound on the leading field alone lets the index range scan start at the cursor.
+        leading = ordering[0]
+        field = leading.lstrip('-')
+        bound = cls._beyond(field, leading.startswith('-'), position[0], model._meta.get_field(field).null, inclusive=True)
+        return bound & condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            value = instance[field_name] if isinstance(instance, dict) else getattr(instance, field_name)
+            values.append(None if value is None else str(value))
+        return json.dumps(values)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            # Past the end: everything before the cursor's own row.
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+
+class AlbumCursorPagination(CatalogCursorPagination):
+    ordering = ('-release_date', '-id')
+
+
+class TrackCursorPagination(CatalogCursorPagination):
+    # Album by album in running order, served by track_live_album_number_idx;
+    # `id` breaks ties between tracks with no track number.
+    ordering = ('album_id', 'track_number', 'id')
+
+
+class SearchPagination(PageNumberPagination):
+    """Search results are ordered by rank, which has no stable keyset."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+class SupportersPagination(PageNumberPagination):
+    """Leaderboard pages are addressed by rank position, so page numbers fit."""
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class PlaquePurchaseCursorPagination(CursorPagination):
+    """A fan's purchase history, newest first."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-id',)
@@ -0,0 +1,67 @@
+"""
+Deferred album rollups.
+
+Track changes only mark their album as dirty; `track_count` and `duration`
+are recomputed once per album, with one grouped query, when the surrounding
+transaction commits. Saving a whole tracklist, or cascading an album delete,
+therefore costs one rollup instead of several writes per track.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+
+_local = threading.local()
+
+
+def mark_album_dirty(album_id):
+    """Schedule a rollup of `album_id` for when the current transaction commits."""
+    pending = getattr(_local, 'album_ids', None)
+    if pending is None:
+        pending = _local.album_ids = set()
+    pending.add(album_id)
+    # Outside a transaction this flushes immediately. Inside one, every call
+    # registers a callback but only the first to run finds work to do; ids
+    # left behind by a rollback are harmlessly recomputed on the next commit.
+    transaction.on_commit(flush_dirty_albums)
+
+
+def flush_dirty_albums():
+    album_ids = getattr(_local, 'album_ids', None)
+    if not album_ids:
+        return
+    _local.album_ids = None
+    recompute_album_rollups(album_ids)
+
+
+def recompute_album_rollups(album_ids):
+    """
+    Recompute `track_count` and `duration` for the given albums with one
+    grouped aggregate and one bulk UPDATE. Albums that no longer exist are
+    skipped. Returns the number of albums updated.
+    """
+    from .models import Album, Track
+
+    album_ids = set(album_ids)
+    totals = {
+        row['album_id']: row
+        for row in Track.all_objects.filter(album_id__in=album_ids)
+        .order_by()
+        .values('album_id')
+        .annotate(count=Count('id'), duration=Sum('duration'))
+    }
+    now = timezone.now()
+    albums = list(Album.all_objects.filter(id__in=album_ids).only('id'))
+    for album in albums:
+        row = totals.get(album.id, {})
+        album.track_count = row.get('count', 0)
+        album.duration = row.get('duration') or None
+        album.updated_at = now
+    if albums:
+        Album.all_objects.bulk_update(albums, ['track_count', 'duration', 'updated_at'])
+        # bulk_update bypasses post_save, so invalidate cached catalog payloads here.
+        transaction.on_commit(bump_catalog_version)
+    return len(albums)
@@ -0,0 +1,102 @@
+"""
+Catalog full-text search.
+
+On PostgreSQL, albums and tracks carry a precomputed `search_vector`
+(tsvector) column backed by a GIN index, and artist stage names are matched
+through an expression GIN index on the user table. Other databases fall back
+to `icontains` matching so the same API works on SQLite.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from .models import Album, Track
+
+SEARCH_CONFIG = 'simple'
+
+ALBUM_SEARCH_FIELDS = ('title', 'publisher', 'description')
+TRACK_SEARCH_FIELDS = ('title', 'featured_artists', 'producer', 'writer')
+ARTIST_SEARCH_FIELDS = ('stage_name',)
+
+ALBUM_VECTOR = (
+    SearchVector('title', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('publisher', weight='B', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+)
+TRACK_VECTOR = (
+    SearchVector('title', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('featured_artists', weight='B', config=SEARCH_CONFIG)
+    + SearchVector('producer', weight='C', config=SEARCH_CONFIG)
+    + SearchVector('writer', weight='C', config=SEARCH_CONFIG)
+)
+# Must stay identical to the expression index created in users/migrations.
+ARTIST_VECTOR = SearchVector('stage_name', config=SEARCH_CONFIG)
+
+
+def uses_full_text_search():
+    return connection.vendor == 'postgresql'
+
+
+def update_album_search_vectors(album_ids=None):
+    """Recompute `Album.search_vector` in place; a no-op off PostgreSQL."""
+    if not uses_full_text_search():
+        return 0
+    albums = Album.all_objects.all() if album_ids is None else Album.all_objects.filter(id__in=album_ids)
+    return albums.update(search_vector=ALBUM_VECTOR)
+
+
+def update_track_search_vectors(track_ids=None):
+    """Recompute `Track.search_vector` in place; a no-op off PostgreSQL."""
+    if not uses_full_text_search():
+        return 0
+    tracks = Track.all_objects.all() if track_ids is None else Track.all_objects.filter(id__in=track_ids)
+    return tracks.update(search_vector=TRACK_VECTOR)
+
+
+def _fallback_search(queryset, fields, term):
+    match = Q()
+    for field in fields:
+        match |= Q(**{f'{field}__icontains': term})
+    # Rank title/name matches above matches in secondary fields.
+    return queryset.filter(match).annotate(
+        rank=Case(
+            When(**{f'{fields[0]}__icontains': term}, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    ).order_by('-rank', '-id')
+
+
+def _search_query(term):
+    return SearchQuery(term, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def search_albums(term):
+    queryset = Album.objects.select_related('artist', 'genre')
+    if not uses_full_text_search():
+        return _fallback_search(queryset, ALBUM_SEARCH_FIELDS, term)
+    query = _search_query(term)
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-id')
+
+
+def search_tracks(term):
+    queryset = Track.objects.all()
+    if not uses_full_text_search():
+        return _fallback_search(queryset, TRACK_SEARCH_FIELDS, term)
+    query = _search_query(term)
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-id')
+
+
+def search_artists(term):
+    queryset = get_user_model().objects.filter(is_artist=True)
+    if not uses_full_text_search():
+        return _fallback_search(queryset, ARTIST_SEARCH_FIELDS, term)
+    query = _search_query(term)
+    return queryset.annotate(search=ARTIST_VECTOR).filter(search=query).annotate(
+        rank=SearchRank(ARTIST_VECTOR, query)
+    ).order_by('-rank', '-id')
@@ -1,8 +1,11 @@
 from rest_framework import serializers
+from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
-from .models import Album, Plaque, Track, PlaquePurchase, Genre
+from .models import Album, AlbumActivity, Plaque, Track, PlaquePurchase, Genre, UserPlaqueSummary
+from backend.renditions import ImageRenditionsField
+from .minting import PlaqueOrder, missing_references, mint_plaques
 from django.db.models import Count, Q
-import uuid
+from decimal import Decimal
 
 class PlaquePurchaseCountSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,43 +17,116 @@ class GenreSerializer(serializers.ModelSerializer):
         model = Genre
         fields = '__all__'
 
-class TrackSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Lets clients trim the output with `?fields=a,b` and/or `?exclude=c,d`.
+    `get_source_columns()` reports which model columns the remaining fields
+    read, so views can project the queryset with `.only()`.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        requested = self._parse_field_list(request.query_params.get('fields'))
+        excluded = self._parse_field_list(request.query_params.get('exclude'))
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+        for name in excluded:
+            self.fields.pop(name, None)
+
+    @staticmethod
+    def _parse_field_list(value):
+        return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+    def get_source_columns(self):
+        """
+        Return the ORM paths (e.g. `title`, `artist__first_name`) read by the
+        current fields, or None if any field reads something other than a
+        model column and the queryset must not be projected.
+        """
+        model = self.Meta.model
+        columns = {model._meta.pk.name}
+        for field in self.fields.values():
+            if field.source == '*' or not field.source_attrs:
+                return None
+            opts = model._meta
+            path = []
+            for attr in field.source_attrs:
+                try:
+                    model_field = opts.get_field(attr)
+                except Exception:
+                    return None
+                if not model_field.concrete:
+                    return None
+                path.append(model_field.name)
+                if not model_field.is_relation:
+                    break
+                opts = model_field.related_model._meta
+            columns.add('__'.join(path))
+            prefix = ''.join(f'{attr}__' for attr in path[:-1])
+            columns.update(prefix + column for column in getattr(field, 'extra_source_columns', ()))
+        return columns
+
+class TrackSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    track_art_renditions = ImageRenditionsField(source='track_art')
+
     class Meta:
         model = Track
-        fields = '__all__'
+        exclude = ['search_vector']
 
-class AlbumSerializer(serializers.ModelSerializer):
+class TrackImportSerializer(serializers.ModelSerializer):
+    """Validates one row of a bulk track import; the album comes from the URL."""
+    class Meta:
+        model = Track
+        exclude = ['album', 'track_art', 'search_vector']
+
+class AlbumSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     artist_name = serializers.CharField(source='artist.first_name', read_only=True)
     genre_name = serializers.CharField(source='genre.name', read_only=True)
     stage_name = serializers.CharField(source='artist.stage_name')
+    cover_art_renditions = ImageRenditionsField(source='cover_art')
     
     class Meta:
         model = Album
-        fields = '__all__'
+        exclude = ['search_vector']
+
+class ArtistSearchSerializer(serializers.ModelSerializer):
+    profile_pic_renditions = ImageRenditionsField(source='profile_pic')
+
+    class Meta:
+        model = get_user_model()
+        fields = ['id', 'stage_name', 'first_name', 'last_name', 'genre', 'profile_pic', 'profile_pic_renditions']
+
+class AlbumSupporterSerializer(serializers.ModelSerializer):
+    rank = serializers.IntegerField(read_only=True)
+    plaque_tier = serializers.CharField(read_only=True)
+    user_id = serializers.IntegerField(read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+    stage_name = serializers.CharField(source='user.stage_name', read_only=True)
+
+    class Meta:
+        model = AlbumActivity
+        fields = ['rank', 'user_id', 'username', 'stage_name', 'amount_supported', 'currency', 'plaque_count', 'plaque_tier']
+
+
+class ContributionSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    currency = serializers.ChoiceField(choices=[choice for choice, _ in AlbumActivity._meta.get_field('currency').choices])
+    plaques = serializers.IntegerField(min_value=0, default=0)
+
 
 class SupportAlbumSerializer(serializers.Serializer):
-    album_id = serializers.IntegerField()
-    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
-    
+    album_id = serializers.IntegerField(source='album_supported_id')
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, source='contribution_amount')
+
     def create(self, validated_data):
         user = self.context['request'].user
-        album = get_object_or_404(Album, id=validated_data['album_id'])
-        amount = validated_data['amount']
-        
-        purchase = PlaquePurchase.objects.create(
-            fan=user,
-            album_supported=album,
-            contribution_amount=amount,
-            hash_key=str(uuid.uuid4()),
-            transaction_id=str(uuid.uuid4())
-        )
-        
-        plaque = Plaque.objects.create(
-            plaque_type=purchase.get_plaque_type(amount)
-        )
-        
-        purchase.plaque = plaque
-        purchase.save()
+        album = get_object_or_404(Album.objects, id=validated_data['album_supported_id'])
+        [purchase] = mint_plaques([
+            PlaqueOrder(fan_id=user.id, album_id=album.id, amount=validated_data['contribution_amount'])
+        ])
         return purchase
     
     def to_representation(self, instance):
@@ -61,6 +137,38 @@ class SupportAlbumSerializer(serializers.Serializer):
         }
         return response
 
+class PlaqueMintOrderSerializer(serializers.Serializer):
+    fan_id = serializers.IntegerField()
+    album_id = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    transaction_id = serializers.CharField(max_length=100, required=False)
+
+
+class PlaqueMintSerializer(serializers.Serializer):
+    plaques = PlaqueMintOrderSerializer(many=True, allow_empty=False, max_length=5000)
+    payment_status = serializers.ChoiceField(choices=['pending', 'completed'], default='completed')
+    payment_method = serializers.CharField(max_length=50, required=False, allow_null=True, default=None)
+
+    def validate(self, attrs):
+        attrs['plaques'] = [PlaqueOrder(**order) for order in attrs['plaques']]
+        missing_fans, missing_albums = missing_references(attrs['plaques'])
+        errors = {}
+        if missing_fans:
+            errors['fan_id'] = [f'Unknown users: {missing_fans}']
+        if missing_albums:
+            errors['album_id'] = [f'Unknown or unpublished albums: {missing_albums}']
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        return mint_plaques(
+            validated_data['plaques'],
+            payment_status=validated_data['payment_status'],
+            payment_method=validated_data['payment_method'],
+        )
+
+
 class PlaqueSerializer(serializers.ModelSerializer):
     class Meta:
         model = Plaque
@@ -91,12 +199,10 @@ class UserPlaqueStatsSerializer(serializers.Serializer):
     
     def to_representation(self, instance):
         user = self.context['request'].user
-        purchased = PlaquePurchase.objects.filter(fan=user, payment_status='completed').count()
-        pending = PlaquePurchase.objects.filter(fan=user, payment_status='pending').count()
-        albums_supported = PlaquePurchase.objects.filter(fan=user).values('album_supported').distinct().count()
-        
+        summary = UserPlaqueSummary.for_fan(user.id)
+
         return {
-            'purchased': purchased,
-            'pending': pending,
-            'albums_supported': albums_supported
+            'purchased': summary['purchased'],
+            'pending': summary['pending'],
+            'albums_supported': summary['albums_supported']
         }
\ No newline at end of file
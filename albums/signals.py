@@ -1,21 +1,202 @@
-from django.db.models.signals import post_save, post_delete
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
-from .models import Track
+from .models import Album, AlbumActivity, AlbumStats, Genre, PlaquePurchase, Track, UserPlaqueSummary
+from .cache import bump_album_version, bump_catalog_version
+from .rollups import mark_album_dirty
+from backend.renditions import changed_image_fields, remember_image_names, schedule_renditions
+from .search import (
+    ALBUM_SEARCH_FIELDS, TRACK_SEARCH_FIELDS,
+    update_album_search_vectors, update_track_search_vectors,
+)
 
-@receiver([post_save,post_delete], sender=Track)
-def update_album_duration(sender, instance, **kwargs):
+# UserAccount fields rendered inside catalog payloads.
+CATALOG_ARTIST_FIELDS = {'first_name', 'stage_name', 'is_artist'}
+
+# Image fields that get pre-generated renditions.
+ALBUM_IMAGE_FIELDS = ['cover_art']
+TRACK_IMAGE_FIELDS = ['track_art']
+
+@receiver([post_save, post_delete], sender=Track)
+def update_album_rollups(sender, instance, raw=False, **kwargs):
     """
-    Signal to update the album's duration when a track is saved or deleted.
+    Signal to refresh the album's track count and duration when a track is
+    saved or deleted. The rollup is deferred until the transaction commits and
+    runs once per album, however many of its tracks changed.
     """
-    if instance.album:
-        instance.album.update_duration()
-        instance.album.save()
+    if instance.album_id and not raw:
+        mark_album_dirty(instance.album_id)
 
-@receiver([post_save, post_delete], sender=Track)
-def update_album_track_count(sender, instance, **kwargs):
+@receiver(post_save, sender=Album)
+def update_album_search_vector(sender, instance, update_fields=None, raw=False, **kwargs):
+    """
+    Signal to refresh an album's full-text search vector when its text changes.
+    """
+    if raw or (update_fields and not set(ALBUM_SEARCH_FIELDS).intersection(update_fields)):
+        return
+    update_album_search_vectors([instance.pk])
+
+@receiver(post_save, sender=Track)
+def update_track_search_vector(sender, instance, update_fields=None, raw=False, **kwargs):
+    """
+    Signal to refresh a track's full-text search vector when its text changes.
+    """
+    if raw or (update_fields and not set(TRACK_SEARCH_FIELDS).intersection(update_fields)):
+        return
+    update_track_search_vectors([instance.pk])
+
+@receiver([post_save, post_delete], sender=Album)
+@receiver([post_save, post_delete], sender=Genre)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    """
+    Signal to invalidate cached catalog payloads when an album or genre changes.
+    The bump waits for the commit: bumped earlier, a concurrent request could
+    cache the old rows under the new version.
+    """
+    transaction.on_commit(bump_catalog_version)
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_catalog_cache_for_artist(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal to invalidate cached catalog payloads when an artist's displayed
+    name changes. Saves that only touch other fields (e.g. last_login) are ignored.
+    """
+    if update_fields and not CATALOG_ARTIST_FIELDS.intersection(update_fields):
+        return
+    transaction.on_commit(bump_catalog_version)
+
+def _support_contribution(snapshot):
+    """Split an AlbumActivity snapshot into (usd, zig, bids) stats contributions."""
+    if not snapshot:
+        return 0, 0, 0
+    amount = snapshot['amount_supported'] or 0
+    usd = amount if snapshot['currency'] == 'USD' else 0
+    zig = amount if snapshot['currency'] == 'ZWL' else 0
+    bids = 1 if snapshot['bid_amount'] is not None else 0
+    return usd, zig, bids
+
+@receiver(post_save, sender=Album)
+def create_album_stats(sender, instance, created, raw=False, **kwargs):
+    """
+    Signal to create an empty stats row for every new album.
+    """
+    if created and not raw:
+        AlbumStats.objects.get_or_create(album=instance)
+
+@receiver(post_save, sender=AlbumActivity)
+def update_album_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Signal to apply the change in an activity's support to its album's stats row.
+    """
+    if raw:
+        return
+    old = None if created else getattr(instance, '_loaded_stats', None)
+    new = instance.stats_snapshot()
+    if not created and old is None:
+        # Saved without a loaded snapshot (e.g. a partial instance): the delta
+        # is unknown, so recompute the album from scratch.
+        AlbumStats.rebuild(album_ids=[instance.album_id])
+    else:
+        old_usd, old_zig, old_bids = _support_contribution(old)
+        new_usd, new_zig, new_bids = _support_contribution(new)
+        AlbumStats.apply_delta(
+            instance.album_id,
+            usd=new_usd - old_usd,
+            zig=new_zig - old_zig,
+            bids=new_bids - old_bids,
+        )
+    instance._loaded_stats = new
+
+@receiver(post_delete, sender=AlbumActivity)
+def update_album_stats_on_delete(sender, instance, **kwargs):
+    """
+    Signal to remove a deleted activity's support from its album's stats row.
+    """
+    usd, zig, bids = _support_contribution(getattr(instance, '_loaded_stats', instance.stats_snapshot()))
+    AlbumStats.apply_delta(instance.album_id, usd=-usd, zig=-zig, bids=-bids, rebuild_missing=False)
+
+@receiver([post_save, post_delete], sender=AlbumActivity)
+def invalidate_album_supporters(sender, instance, raw=False, **kwargs):
+    """
+    Signal to drop the album's cached supporter leaderboard when support
+    changes, once the change is committed (see `bump_catalog_version`).
+    """
+    if not raw:
+        album_id = instance.album_id
+        transaction.on_commit(lambda: bump_album_version(album_id))
+
+@receiver(post_init, sender=Album)
+@receiver(post_init, sender=Track)
+def remember_catalog_images(sender, instance, **kwargs):
+    """
+    Signal to record loaded image names so that new uploads can be detected.
+    """
+    fields = ALBUM_IMAGE_FIELDS if sender is Album else TRACK_IMAGE_FIELDS
+    remember_image_names(instance, fields)
+
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=Track)
+def generate_catalog_image_renditions(sender, instance, created, raw=False, **kwargs):
+    """
+    Signal to generate cover/track art renditions in the background after upload.
+    """
+    if raw:
+        return
+    fields = ALBUM_IMAGE_FIELDS if sender is Album else TRACK_IMAGE_FIELDS
+    schedule_renditions(instance, changed_image_fields(instance, fields, created))
+    remember_image_names(instance, fields)
+
+def _fan_supports_album(fan_id, album_id, exclude_pk):
+    return PlaquePurchase.objects.filter(fan_id=fan_id, album_supported_id=album_id).exclude(pk=exclude_pk).exists()
+
+def _summary_contribution(snapshot):
+    """Split a PlaquePurchase snapshot into its status counter contributions."""
+    if not snapshot:
+        return {'total': 0, 'purchased': 0, 'pending': 0}
+    return {
+        'total': 1,
+        'purchased': 1 if snapshot['payment_status'] == 'completed' else 0,
+        'pending': 1 if snapshot['payment_status'] == 'pending' else 0,
+    }
+
+@receiver(post_save, sender=PlaquePurchase)
+def update_plaque_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Signal to apply a purchase's status/album change to its fan's plaque summary.
+    """
+    if raw:
+        return
+    old = None if created else getattr(instance, '_loaded_summary', None)
+    new = instance.summary_snapshot()
+    if not created and (old is None or old['fan_id'] != new['fan_id']):
+        # Unknown previous state, or the purchase moved to another fan.
+        UserPlaqueSummary.rebuild(fan_ids={new['fan_id'], *([old['fan_id']] if old else [])})
+    else:
+        old_counts = _summary_contribution(old)
+        new_counts = _summary_contribution(new)
+        deltas = {field: new_counts[field] - old_counts[field] for field in new_counts}
+        old_album = old['album_supported_id'] if old else None
+        new_album = new['album_supported_id']
+        if old_album != new_album:
+            albums_supported = 0
+            if old_album is not None and not _fan_supports_album(new['fan_id'], old_album, instance.pk):
+                albums_supported -= 1
+            if new_album is not None and not _fan_supports_album(new['fan_id'], new_album, instance.pk):
+                albums_supported += 1
+            deltas['albums_supported'] = albums_supported
+        UserPlaqueSummary.apply_delta(new['fan_id'], **deltas)
+    instance._loaded_summary = new
+
+@receiver(post_delete, sender=PlaquePurchase)
+def update_plaque_summary_on_delete(sender, instance, **kwargs):
     """
-    Signal to update the album's track count when a track is saved or deleted.
+    Signal to remove a deleted purchase from its fan's plaque summary.
     """
-    if instance.album:
-        instance.album.update_track_count()
-        instance.album.save()
+    snapshot = getattr(instance, '_loaded_summary', instance.summary_snapshot())
+    deltas = {field: -count for field, count in _summary_contribution(snapshot).items()}
+    album_id = snapshot['album_supported_id']
+    if album_id is not None and not _fan_supports_album(snapshot['fan_id'], album_id, instance.pk):
+        deltas['albums_supported'] = -1
+    # The fan may be mid-cascade delete, so never recreate a missing row here.
+    UserPlaqueSummary.apply_delta(snapshot['fan_id'], rebuild_missing=False, **deltas)
@@ -0,0 +1,36 @@
+"""
+Per-album supporter leaderboard.
+
+Ranks are computed in the database with `RANK() OVER (PARTITION BY album
+ORDER BY amount_supported DESC)`, served from the composite
+(album, -amount_supported) index on AlbumActivity.
+"""
+from django.db.models import F, IntegerField, Window
+from django.db.models.functions import Rank
+
+from .models import AlbumActivity
+from .tiers import plaque_type_case
+
+
+def album_supporters(album_id):
+    """
+    An album's supporters ordered by rank, annotated with `rank` and
+    `plaque_tier`. Ties share a rank; the next rank skips accordingly.
+    """
+    return (
+        AlbumActivity.objects.filter(album_id=album_id, amount_supported__gt=0)
+        .select_related('user')
+        .annotate(
+            rank=Window(
+                expression=Rank(),
+                partition_by=F('album_id'),
+                # album_id is constant within the partition, so it never breaks
+                # ties; it only stops Django 5.0 from wrapping a lone decimal
+                # ORDER BY in CAST(... AS NUMERIC), which SQLite rejects.
+                order_by=[F('amount_supported').desc(), F('album_id')],
+                output_field=IntegerField(),
+            ),
+            plaque_tier=plaque_type_case('amount_supported'),
+        )
+        .order_by('rank', 'id')
+    )
@@ -1,3 +1,89 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+
+from .cache import get_album_version, get_catalog_version
+from .models import Album, AlbumActivity, Genre, TrendingAlbum
+from .trending import refresh_trending
+
+
+def _user(name):
+    return get_user_model().objects.create_user(
+        email=f'{name}@example.com', username=name, password='secret', first_name=name, last_name='Test',
+    )
+
+
+class TrendingRefreshTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.album = Album.objects.create(
+            artist=_user('artist'), title='Album', release_date=date(2024, 1, 1), description='', is_published=True,
+        )
+        cls.supporter = AlbumActivity.objects.create(
+            user=_user('supporter'), album=cls.album, currency='USD', bid_amount=Decimal('10.00'),
+        )
+        cls.fan = AlbumActivity.objects.create(user=_user('fan'), album=cls.album, liked=True)
+        two_days_ago = timezone.now() - timedelta(days=2)
+        AlbumActivity.objects.update(bid_date=two_days_ago, updated_at=two_days_ago)
+
+    def _score(self):
+        return TrendingAlbum.objects.get(album=self.album).score
+
+    def test_incremental_refresh_matches_full_rebuild(self):
+        refresh_trending(full=True)
+        fan = AlbumActivity.objects.get(pk=self.fan.pk)
+        for _ in range(5):
+            before = self._score()
+            fan.liked = not fan.liked
+            fan.save()
+            refresh_trending()
+            if not fan.liked:
+                self.assertLess(self._score(), before)
+        incremental = self._score()
+
+        refresh_trending(full=True)
+        self.assertAlmostEqual(incremental, self._score(), places=6)
+
+    def test_unliking_a_supported_album_lowers_its_score(self):
+        refresh_trending(full=True)
+        before = self._score()
+        supporter = AlbumActivity.objects.get(pk=self.supporter.pk)
+        supporter.liked = True
+        supporter.save()
+        refresh_trending()
+        self.assertGreater(self._score(), before)
+
+        supporter.liked = False
+        supporter.save()
+        refresh_trending()
+        self.assertAlmostEqual(self._score(), before, places=6)
+
+
+class CatalogCacheInvalidationTests(TestCase):
+    def test_catalog_version_is_bumped_on_commit(self):
+        before = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            genre = Genre.objects.create(name='Jazz')
+            self.assertEqual(get_catalog_version(), before)
+        after = get_catalog_version()
+        self.assertNotEqual(after, before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            genre.delete()
+            self.assertEqual(get_catalog_version(), after)
+        self.assertNotEqual(get_catalog_version(), after)
 
-# Create your tests here.
+    def test_album_version_is_bumped_on_commit(self):
+        album = Album.objects.create(
+            artist=_user('artist'), title='Album', release_date=date(2024, 1, 1), description='', is_published=True,
+        )
+        before = get_album_version(album.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            AlbumActivity.objects.create(
+                user=_user('supporter'), album=album, currency='USD', amount_supported=Decimal('5.00'),
+            )
+            self.assertEqual(get_album_version(album.id), before)
+        self.assertNotEqual(get_album_version(album.id), before)
@@ -0,0 +1,117 @@
+"""
+Plaque tier table.
+
+The single definition of which plaque a contribution amount earns. It is used
+row by row (`plaque_type_for_amount`) and as a SQL `CASE` expression
+(`plaque_type_case`), so bulk reclassification runs entirely in the database.
+
+Payments store the same tiers under their historical labels, which is why each
+tier carries both names.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db.models import Case, CharField, OuterRef, Subquery, Value, When
+
+# A tier applies when `amount <lookup> bound`; tiers are checked in order and
+# the last one (no bound) catches everything above.
+PlaqueTier = namedtuple('PlaqueTier', 'plaque_type payment_plaque_type lookup bound')
+
+PLAQUE_TIERS = (
+    PlaqueTier('thank_you', 'thank_you', 'lt', Decimal('51')),
+    PlaqueTier('wood', 'wood', 'lte', Decimal('100')),
+    PlaqueTier('ruby', 'Gold', 'lte', Decimal('300')),
+    PlaqueTier('bronze', 'Silver', 'lte', Decimal('500')),
+    PlaqueTier('silver', 'Emerald', 'lte', Decimal('700')),
+    PlaqueTier('gold', 'gold', 'lte', Decimal('900')),
+    PlaqueTier('emerald', 'emerald', None, None),
+)
+
+PLAQUE_TYPE = 'plaque_type'
+PAYMENT_PLAQUE_TYPE = 'payment_plaque_type'
+
+RECLASSIFY_BATCH_SIZE = 10000
+
+
+def _matches(amount, tier):
+    if tier.lookup == 'lt':
+        return amount < tier.bound
+    return amount <= tier.bound
+
+
+def plaque_type_for_amount(amount, label=PLAQUE_TYPE):
+    """Return the tier name for `amount`; `label` selects the naming scheme."""
+    amount = Decimal(str(amount))
+    for tier in PLAQUE_TIERS[:-1]:
+        if _matches(amount, tier):
+            return getattr(tier, label)
+    return getattr(PLAQUE_TIERS[-1], label)
+
+
+def plaque_type_case(amount_field, label=PLAQUE_TYPE):
+    """SQL `CASE` mapping `amount_field` to its tier name, mirroring `plaque_type_for_amount`."""
+    return Case(
+        *(
+            When(**{f'{amount_field}__{tier.lookup}': tier.bound}, then=Value(getattr(tier, label)))
+            for tier in PLAQUE_TIERS[:-1]
+        ),
+        default=Value(getattr(PLAQUE_TIERS[-1], label)),
+        output_field=CharField(),
+    )
+
+
+def _pk_ranges(queryset, batch_size):
+    """Yield (after, upto) primary-key bounds covering `queryset` in batches."""
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    after = None
+    while True:
+        window = pks if after is None else pks.filter(pk__gt=after)
+        upto = window[batch_size - 1:batch_size].first()
+        if upto is None:
+            yield after, None
+            return
+        yield after, upto
+        after = upto
+
+
+def _reclassify(queryset, target_field, expression, batch_size):
+    updated = 0
+    for after, upto in _pk_ranges(queryset, batch_size):
+        batch = queryset
+        if after is not None:
+            batch = batch.filter(pk__gt=after)
+        if upto is not None:
+            batch = batch.filter(pk__lte=upto)
+        # Only touch rows whose stored tier is actually wrong.
+        updated += batch.exclude(**{target_field: expression}).update(**{target_field: expression})
+    return updated
+
+
+def reclassify_payments(batch_size=RECLASSIFY_BATCH_SIZE):
+    """Re-derive `Payment.plaque_type` from `amount` with one UPDATE per primary-key range."""
+    from payments.models import Payment
+
+    return _reclassify(
+        Payment.objects.all(), 'plaque_type',
+        plaque_type_case('amount', PAYMENT_PLAQUE_TYPE), batch_size,
+    )
+
+
+def reclassify_plaques(batch_size=RECLASSIFY_BATCH_SIZE):
+    """
+    Re-derive `Plaque.plaque_type` from the owning purchase's
+    `contribution_amount`, via a correlated subquery, one UPDATE per
+    primary-key range. Plaques without a purchase are left alone.
+    """
+    from .models import Plaque, PlaquePurchase
+
+    expression = Subquery(
+        PlaquePurchase.objects.filter(plaque_id=OuterRef('pk'))
+        .annotate(tier=plaque_type_case('contribution_amount'))
+        .values('tier')[:1],
+        output_field=CharField(),
+    )
+    return _reclassify(
+        Plaque.objects.filter(purchase_details__isnull=False), 'plaque_type',
+        expression, batch_size,
+    )
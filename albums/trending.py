@@ -0,0 +1,137 @@
+"""
+Trending albums leaderboard.
+
+Each support event contributes `weight * exp(-age / TAU)` to its album's
+score, so recent activity dominates and old activity fades out smoothly:
+
+- a plaque purchase weighs `log1p(contribution_amount)`,
+- an AlbumActivity with a bid weighs SUPPORTER_WEIGHT, aged from its latest
+  bid (`bid_date`),
+- a like weighs LIKE_WEIGHT, aged from the row's last change (`updated_at`).
+
+Taking back a like only removes its weight, so it can never raise a score.
+
+The incremental refresh decays every stored score to "now" with one UPDATE,
+then rescores from scratch the albums with purchases past the watermark or
+activity rows changed since the last refresh. Rescoring, rather than adding
+the changed rows on top, keeps a row that changes repeatedly from being
+counted more than once, so the touched albums end up exactly as a full
+rebuild would leave them. A full rebuild recomputes the table from the
+events inside WINDOW, dropping anything that has aged out; run it
+periodically (e.g. nightly) to also drop aged-out events from untouched
+albums and to pick up rows stamped before, but committed after, an
+incremental refresh.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AlbumActivity, PlaquePurchase, TrendingAlbum, TrendingWatermark
+
+HALF_LIFE = timedelta(hours=getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 72))
+WINDOW = timedelta(days=getattr(settings, 'TRENDING_WINDOW_DAYS', 30))
+TAU = HALF_LIFE.total_seconds() / math.log(2)
+
+SUPPORTER_WEIGHT = 3.0
+LIKE_WEIGHT = 1.0
+
+
+def _decay(age):
+    return math.exp(-max(age.total_seconds(), 0) / TAU)
+
+
+def _purchase_time(purchase_date):
+    # purchase_date is a DateField; count the purchase from the start of its day.
+    return timezone.make_aware(datetime.combine(purchase_date, time.min), timezone.get_default_timezone())
+
+
+def _collect_scores(now, since, purchases, activities):
+    scores = defaultdict(float)
+    for album_id, amount, purchase_date in purchases.values_list(
+        'album_supported_id', 'contribution_amount', 'purchase_date'
+    ).iterator(chunk_size=2000):
+        if album_id is None:
+            continue
+        scores[album_id] += math.log1p(float(amount)) * _decay(now - _purchase_time(purchase_date))
+    for album_id, bid_amount, bid_date, liked, updated_at in activities.values_list(
+        'album_id', 'bid_amount', 'bid_date', 'liked', 'updated_at'
+    ).iterator(chunk_size=2000):
+        if bid_amount is not None and bid_date >= since:
+            scores[album_id] += SUPPORTER_WEIGHT * _decay(now - bid_date)
+        if liked:
+            scores[album_id] += LIKE_WEIGHT * _decay(now - updated_at)
+    return scores
+
+
+def refresh_trending(full=False):
+    """
+    Bring the TrendingAlbum table up to date and return the number of albums
+    that were rescored. Concurrent refreshes serialize on the watermark row.
+    """
+    now = timezone.now()
+    since = now - WINDOW
+    with transaction.atomic():
+        TrendingWatermark.objects.get_or_create(pk=1)
+        watermark = TrendingWatermark.objects.select_for_update().get(pk=1)
+
+        # Fix the upper bound first so rows inserted mid-refresh are picked up next time.
+        last_purchase_id = PlaquePurchase.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        purchases = PlaquePurchase.objects.order_by().filter(
+            purchase_date__gte=since.date(), id__lte=last_purchase_id,
+        )
+        activities = AlbumActivity.objects.order_by().filter(updated_at__gte=since, updated_at__lte=now)
+
+        if full or watermark.refreshed_at is None:
+            TrendingAlbum.objects.all().delete()
+            scores = _collect_scores(now, since, purchases, activities)
+            touched = set(scores)
+        else:
+            touched = set(
+                PlaquePurchase.objects.order_by()
+                .filter(id__gt=watermark.last_purchase_id, id__lte=last_purchase_id, album_supported__isnull=False)
+                .values_list('album_supported_id', flat=True)
+                .distinct()
+            )
+            touched.update(
+                AlbumActivity.objects.order_by()
+                .filter(updated_at__gt=watermark.refreshed_at, updated_at__lte=now)
+                .values_list('album_id', flat=True)
+                .distinct()
+            )
+            # Decaying every score by the same factor keeps the ranking intact
+            # while making old and new contributions comparable.
+            TrendingAlbum.objects.update(
+                score=F('score') * _decay(now - watermark.refreshed_at),
+                scored_at=now,
+            )
+            scores = _collect_scores(
+                now,
+                since,
+                purchases.filter(album_supported_id__in=touched),
+                activities.filter(album_id__in=touched),
+            )
+            # Albums left with nothing in the window drop out, as in a full rebuild.
+            TrendingAlbum.objects.filter(album_id__in=touched - set(scores)).delete()
+
+        existing = {row.album_id: row for row in TrendingAlbum.objects.filter(album_id__in=scores)}
+        to_update, to_create = [], []
+        for album_id, score in scores.items():
+            row = existing.get(album_id)
+            if row is None:
+                to_create.append(TrendingAlbum(album_id=album_id, score=score, scored_at=now))
+            else:
+                row.score = score
+                row.scored_at = now
+                to_update.append(row)
+        TrendingAlbum.objects.bulk_create(to_create, batch_size=500)
+        TrendingAlbum.objects.bulk_update(to_update, ['score', 'scored_at'], batch_size=500)
+
+        watermark.last_purchase_id = last_purchase_id
+        watermark.refreshed_at = now
+        watermark.save()
+    return len(touched)
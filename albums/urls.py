@@ -2,19 +2,26 @@ from django.urls import path
 from .views import (
     LatestAlbumsView, AlbumDetailView, AllAlbumsView, UserPlaquePurchaseCountView,
     AllTracksView, TrackDetailView, AlbumTracksView, AlbumStatisticsView, AllGenreView,
-    AllPlaquePurchaseView, UserPlaqueStatsView
+    AllPlaquePurchaseView, UserPlaqueStatsView, AlbumTrackImportView, CatalogSearchView,
+    TrendingAlbumsView, AlbumSupportersView, AlbumContributionView, PlaqueMintView
 )
 
 urlpatterns = [
     path('plaques-count/', UserPlaquePurchaseCountView.as_view(), name='plaques-count'),
     path('plaques-status-count/', UserPlaqueStatsView.as_view(), name='plaques-status-count'),
     path('my-plaques/', AllPlaquePurchaseView.as_view(), name='allmyplaques'),
+    path('plaques/mint/', PlaqueMintView.as_view(), name='plaques-mint'),
     path('albums/', AllAlbumsView.as_view(), name='all-albums'),
     path('latest-albums/', LatestAlbumsView.as_view(), name='latest-albums'),
     path('albums/<int:id>/', AlbumDetailView.as_view(), name='album-detail'),
     path('albums/<int:id>/statistics/', AlbumStatisticsView.as_view(), name='album-statistics'),
     path('tracks/', AllTracksView.as_view(), name='all-tracks'),
     path('tracks/<int:id>/', TrackDetailView.as_view(), name='track-detail'),
+    path('albums/<int:id>/contributions/', AlbumContributionView.as_view(), name='album-contributions'),
+    path('albums/<int:id>/supporters/', AlbumSupportersView.as_view(), name='album-supporters'),
     path('albums/<int:id>/tracks/', AlbumTracksView.as_view(), name='album-tracks'),
+    path('albums/<int:id>/tracks/import/', AlbumTrackImportView.as_view(), name='album-tracks-import'),
     path('albums/genre/', AllGenreView.as_view(), name='genreview'),
+    path('albums/search/', CatalogSearchView.as_view(), name='catalog-search'),
+    path('albums/trending/', TrendingAlbumsView.as_view(), name='trending-albums'),
 ]
\ No newline at end of file
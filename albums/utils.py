@@ -1,6 +1,15 @@
 # myapp/utils.py
 import hashlib
+import secrets
 
 def generate_purchase_hash(fan_id, plaque_id, album_id):
     raw_string = f"{fan_id}-{plaque_id}-{album_id}"
     return hashlib.sha256(raw_string.encode()).hexdigest()
+
+def generate_plaque_hashes(rows):
+    """
+    Hash keys for a batch of new plaques, one per `(fan_id, album_id)` row.
+    A random nonce stands in for the plaque id, which does not exist until
+    the plaques are inserted, so keys can be minted before a bulk insert.
+    """
+    return [generate_purchase_hash(fan_id, secrets.token_hex(16), album_id) for fan_id, album_id in rows]
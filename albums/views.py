@@ -2,33 +2,63 @@ from rest_framework import status, generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
+from rest_framework.settings import api_settings
 from django.db import models
-from .serializers import SupportAlbumSerializer, AlbumSerializer, TrackSerializer, GenreSerializer, PlaquePurchaseDetailSerializer, UserPlaqueStatsSerializer
-from .models import Album, PlaquePurchase, AlbumActivity, Track, Genre
+from .serializers import SupportAlbumSerializer, AlbumSerializer, TrackSerializer, GenreSerializer, PlaquePurchaseDetailSerializer, UserPlaqueStatsSerializer, ArtistSearchSerializer, AlbumSupporterSerializer, ContributionSerializer, PlaqueMintSerializer
+from .models import Album, AlbumStats, PlaquePurchase, AlbumActivity, Track, Genre, TrendingAlbum, UserPlaqueSummary
+from .pagination import AlbumCursorPagination, TrackCursorPagination, SearchPagination, PlaquePurchaseCursorPagination, SupportersPagination
+from .cache import get_or_set_album, get_or_set_catalog, get_catalog_modified, get_catalog_version
+from .mixins import ConditionalGetMixin, SparseFieldsetQuerysetMixin
+from .importers import import_tracks
+from .search import search_albums, search_tracks, search_artists
+from .supporters import album_supporters
+from .ingestion import Contribution, ingest_contributions
+from .exports import EXPORT_FORMATS, EXPORT_RENDERERS, stream_export
 
 class LatestAlbumsView(generics.ListAPIView):
-    queryset = Album.objects.order_by('-release_date')[:10]
+    queryset = Album.objects.select_related('artist', 'genre').order_by('-release_date')[:10]
     serializer_class = AlbumSerializer
     permission_classes = [permissions.AllowAny]
+    # Public payload: skip cookie/JWT auth so a cache hit never touches the DB.
+    authentication_classes = []
 
-class AlbumDetailView(generics.RetrieveAPIView):
-    queryset = Album.objects.all()
+    def list(self, request, *args, **kwargs):
+        data = get_or_set_catalog(
+            'latest-albums',
+            lambda: list(self.get_serializer(self.get_queryset(), many=True).data),
+        )
+        return Response(data)
+
+class AlbumDetailView(ConditionalGetMixin, SparseFieldsetQuerysetMixin, generics.RetrieveAPIView):
+    queryset = Album.objects.select_related('artist', 'genre')
     serializer_class = AlbumSerializer
     lookup_field = 'id'
     permission_classes = [permissions.AllowAny]
 
-class AllAlbumsView(generics.ListAPIView):
-    queryset = Album.objects.all()
+    def get_last_modified(self):
+        updated_at = self.get_queryset().filter(id=self.kwargs['id']).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        # Artist and genre names are embedded but carry no timestamp of their
+        # own; their changes bump the catalog version instead, so both
+        # validators must move with it.
+        return max(updated_at, get_catalog_modified())
+
+    def get_etag_parts(self):
+        return [get_catalog_version()]
+
+class AllAlbumsView(SparseFieldsetQuerysetMixin, generics.ListAPIView):
+    queryset = Album.objects.select_related('artist', 'genre')
     serializer_class = AlbumSerializer
+    pagination_class = AlbumCursorPagination
     permission_classes = [permissions.AllowAny]
 
 class UserPlaquePurchaseCountView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-        plaque_count = PlaquePurchase.objects.filter(fan=user).count()
-        return Response({'plaques_purchased': plaque_count})
+        summary = UserPlaqueSummary.for_fan(request.user.id)
+        return Response({'plaques_purchased': summary['total']})
 
 class UserPlaqueStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -39,62 +69,249 @@ class UserPlaqueStatsView(APIView):
         serializer.is_valid(raise_exception=True)
         return Response(serializer.data)
 
-class AllPlaquePurchaseView(APIView):
+class AllPlaquePurchaseView(generics.ListAPIView):
+    """
+    The requesting fan's purchase history, cursor-paginated.
+    `?format=ndjson` or `?format=csv` streams the full history instead.
+    """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = PlaquePurchaseDetailSerializer
-    
-    def get(self, request):
-        user = request.user
-        plaques = PlaquePurchase.objects.filter(fan=user)
-        serializer = self.serializer_class(plaques, many=True)
-        return Response(serializer.data)
+    pagination_class = PlaquePurchaseCursorPagination
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *EXPORT_RENDERERS]
 
-class AllTracksView(generics.ListAPIView):
+    def get_queryset(self):
+        return PlaquePurchase.objects.filter(fan=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        export_format = request.accepted_renderer.format
+        if export_format not in EXPORT_FORMATS:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).order_by('-id')
+        return stream_export(queryset, self.get_serializer(), export_format, filename='plaque-purchases')
+
+class PlaqueMintView(APIView):
+    """
+    Staff-only bulk minting, e.g. after a cash-collection event. Mints every
+    plaque in the request in one transaction and returns the minted keys.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = PlaqueMintSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        purchases = serializer.save()
+        return Response({
+            'minted': len(purchases),
+            'plaques': [
+                {
+                    'fan_id': purchase.fan_id,
+                    'album_id': purchase.album_supported_id,
+                    'plaque_type': purchase.plaque.plaque_type,
+                    'hash_key': purchase.plaque.hash_key,
+                    'purchase_hash_key': purchase.hash_key,
+                    'transaction_id': purchase.transaction_id,
+                }
+                for purchase in purchases
+            ],
+        }, status=status.HTTP_201_CREATED)
+
+class AllTracksView(SparseFieldsetQuerysetMixin, generics.ListAPIView):
     queryset = Track.objects.all()
     serializer_class = TrackSerializer
+    pagination_class = TrackCursorPagination
+    permission_classes = [permissions.AllowAny]
+
+class CatalogSearchView(generics.ListAPIView):
+    """
+    Ranked, paginated catalog search.
+    `?q=` is the search text; `?type=` selects albums (default), tracks or artists.
+    """
+    permission_classes = [permissions.AllowAny]
+    pagination_class = SearchPagination
+    search_types = {
+        'albums': (search_albums, AlbumSerializer),
+        'tracks': (search_tracks, TrackSerializer),
+        'artists': (search_artists, ArtistSearchSerializer),
+    }
+
+    def get_search_type(self):
+        return self.search_types.get(self.request.query_params.get('type', 'albums'))
+
+    def get_queryset(self):
+        search, _ = self.get_search_type()
+        return search(self.request.query_params.get('q', '').strip())
+
+    def get_serializer_class(self):
+        _, serializer_class = self.get_search_type()
+        return serializer_class
+
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('q', '').strip():
+            return Response({'error': 'Missing search query'}, status=status.HTTP_400_BAD_REQUEST)
+        if self.get_search_type() is None:
+            return Response({'error': 'Invalid search type'}, status=status.HTTP_400_BAD_REQUEST)
+        return super().list(request, *args, **kwargs)
+
+class TrendingAlbumsView(APIView):
+    """Top N albums from the materialized trending leaderboard (`?limit=`, max 50)."""
+    permission_classes = [permissions.AllowAny]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        trending = (
+            TrendingAlbum.objects.select_related('album__artist', 'album__genre')
+            .filter(album__is_published=True, album__is_deleted=False)
+            .order_by('-score')[:max(limit, 0)]
+        )
+        albums = []
+        for entry in trending:
+            albums.append({
+                **AlbumSerializer(entry.album, context={'request': request}).data,
+                'trending_score': round(entry.score, 4),
+            })
+        return Response(albums)
+
+class AlbumSupportersView(generics.ListAPIView):
+    """
+    An album's top supporters, ranked by total amount supported. Pages are
+    cached per album until its support changes.
+    """
+    serializer_class = AlbumSupporterSerializer
+    pagination_class = SupportersPagination
     permission_classes = [permissions.AllowAny]
 
+    def get_queryset(self):
+        return album_supporters(self.kwargs['id'])
+
+    def build_page(self, request, *args, **kwargs):
+        if not Album.objects.filter(id=self.kwargs['id']).exists():
+            return None
+        return super().list(request, *args, **kwargs).data
+
+    def list(self, request, *args, **kwargs):
+        data = get_or_set_album(
+            self.kwargs['id'],
+            f'supporters:{request.query_params.urlencode()}',
+            lambda: self.build_page(request, *args, **kwargs),
+        )
+        if data is None:
+            return Response({'error': 'Album not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data)
+
+class AlbumContributionView(APIView):
+    """
+    Record a fan's contribution to an album. Accepts one contribution object
+    or a list of them, written as atomic upserts so bursts on a hot album
+    never lose updates. A fan supports an album in one currency; contributions
+    in another currency are rejected.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, id):
+        if not Album.objects.filter(id=id).exists():
+            return Response({'error': 'Album not found'}, status=status.HTTP_404_NOT_FOUND)
+        many = isinstance(request.data, list)
+        serializer = ContributionSerializer(data=request.data, many=many)
+        serializer.is_valid(raise_exception=True)
+        contributions = [
+            Contribution(
+                user_id=request.user.id,
+                album_id=id,
+                currency=data['currency'],
+                amount=data['amount'],
+                plaques=data['plaques'],
+            )
+            for data in (serializer.validated_data if many else [serializer.validated_data])
+        ]
+        rejected = ingest_contributions(contributions)
+        message = 'Your support for this album is in another currency.'
+        if not many:
+            if rejected:
+                return Response({'error': message}, status=status.HTTP_409_CONFLICT)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        rejected_rows = set(rejected)
+        accepted = [data for index, data in enumerate(serializer.data) if index not in rejected_rows]
+        return Response({
+            'contributions': accepted,
+            'errors': [{'row': index, 'errors': {'currency': [message]}} for index in rejected],
+        }, status=status.HTTP_201_CREATED if accepted else status.HTTP_409_CONFLICT)
+
 class AllGenreView(generics.ListAPIView):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = [permissions.AllowAny]
 
-class TrackDetailView(generics.RetrieveAPIView):
+class TrackDetailView(ConditionalGetMixin, SparseFieldsetQuerysetMixin, generics.RetrieveAPIView):
     queryset = Track.objects.all()
     serializer_class = TrackSerializer
     lookup_field = 'id'
     permission_classes = [permissions.AllowAny]
 
-class AlbumTracksView(ListAPIView):
+    def get_last_modified(self):
+        # Tracks have no timestamp; every track change bumps its album's
+        # updated_at through the album rollup.
+        return self.get_queryset().filter(id=self.kwargs['id']).values_list('album__updated_at', flat=True).first()
+
+class AlbumTracksView(ConditionalGetMixin, SparseFieldsetQuerysetMixin, ListAPIView):
     serializer_class = TrackSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
         album_id = self.kwargs['id']
-        return Track.objects.filter(album_id=album_id, is_deleted=False)
+        return Track.objects.filter(album_id=album_id)
+
+    def get_last_modified(self):
+        return Album.objects.filter(id=self.kwargs['id']).values_list('updated_at', flat=True).first()
+
+class AlbumTrackImportView(APIView):
+    """Bulk-create tracks for an album owned by the requesting artist."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, id):
+        try:
+            # Artists import into drafts too, so look past the live manager.
+            album = Album.all_objects.get(id=id)
+        except Album.DoesNotExist:
+            return Response({'error': 'Album not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if not (request.user.is_staff or album.artist_id == request.user.id):
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        rows = request.data.get('tracks') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'Expected a non-empty list of tracks'}, status=status.HTTP_400_BAD_REQUEST)
+
+        created, errors = import_tracks(album, rows)
+        return Response({
+            'created': len(created),
+            'tracks': TrackSerializer(created, many=True).data,
+            'errors': errors,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
 
 class AlbumStatisticsView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def get(self, request, id):
         try:
-            album = Album.objects.get(id=id)
-            usd_activities = AlbumActivity.objects.filter(album=album, currency='USD')
-            zig_activities = AlbumActivity.objects.filter(album=album, currency='ZWL')
-            
-            usd_total = usd_activities.aggregate(
-                total=models.Sum('amount_supported')
-            )['total'] or 0
-            
-            zig_total = zig_activities.aggregate(
-                total=models.Sum('amount_supported')
-            )['total'] or 0
-            
-            return Response({
-                'usd_support': float(usd_total),
-                'zig_support': float(zig_total),
-                'total_bids': album.total_bids,
-                'current_supporters': album.current_supporters
-            })
-        except Album.DoesNotExist:
-            return Response({'error': 'Album not found'}, status=404)
\ No newline at end of file
+            stats = AlbumStats.with_pending().get(album_id=id)
+        except AlbumStats.DoesNotExist:
+            # Albums created before AlbumStats existed get their row on first read.
+            if not AlbumStats.rebuild(album_ids=[id]):
+                return Response({'error': 'Album not found'}, status=404)
+            stats = AlbumStats.with_pending().get(album_id=id)
+
+        # Contributions not yet folded into the row are added on read.
+        pending_bids = stats.pending_bids or 0
+        return Response({
+            'usd_support': float(stats.usd_support + (stats.pending_usd or 0)),
+            'zig_support': float(stats.zig_support + (stats.pending_zig or 0)),
+            'total_bids': stats.total_bids + pending_bids,
+            'current_supporters': stats.current_supporters + pending_bids
+        })
\ No newline at end of file
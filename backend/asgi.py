@@ -3,6 +3,13 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The ``stream`` process in the Procfile serves it with uvicorn for the
+streaming payment status endpoint (``payments.streams``), which holds idle
+connections open and must not run under the sync gunicorn workers. Route
+``/api/payments/status/<ref>/events/`` to that process at the proxy; every
+other path stays on the ``web`` process. Streaming also needs ``REDIS_URL``
+so status changes saved by the ``web`` process reach it.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
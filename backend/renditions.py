@@ -0,0 +1,198 @@
+"""
+Pre-generated image renditions.
+
+Uploaded images (album covers, track art, profile and cover photos) are
+resized once, after upload, into fixed-size WebP and JPEG variants stored next
+to the original. Serializers expose the variant URLs so list views can
+transfer thumbnails instead of the original multi-megabyte uploads.
+
+Rendition names are derived from the original file name, so URLs can be built
+without touching storage:
+
+    albums/covers/abc.jpg -> albums/covers/renditions/abc_card.webp
+
+Once a file's renditions are written, its name is recorded in the model's
+`image_renditions` field. Serializers only advertise rendition URLs for the
+file recorded there; until then (a fresh upload, or an image the backfill has
+not reached yet) every variant points at the original.
+"""
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# variant -> (max width, max height, crop to exact size)
+RENDITIONS = {
+    'thumb': (160, 160, True),
+    'card': (480, 480, False),
+    'full': (1600, 1600, False),
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_RENDITION_WORKERS', 2),
+    thread_name_prefix='renditions',
+)
+
+
+def rendition_name(name, variant, fmt='webp'):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'renditions', f"{stem}_{variant}.{fmt}")
+
+
+def rendition_urls(fieldfile, rendered_name=None):
+    """
+    Return `{variant: {format: url}}` for an image field, or None if it is
+    empty. Unless `rendered_name` says the renditions of this very file exist,
+    every URL is the original's.
+    """
+    if not fieldfile:
+        return None
+    storage = fieldfile.storage
+    if rendered_name != fieldfile.name:
+        return {variant: dict.fromkeys(FORMATS, fieldfile.url) for variant in RENDITIONS}
+    return {
+        variant: {fmt: storage.url(rendition_name(fieldfile.name, variant, fmt)) for fmt in FORMATS}
+        for variant in RENDITIONS
+    }
+
+
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """
+    Read-only serializer field exposing the rendition URLs of an image field,
+    e.g. `cover_art_renditions = ImageRenditionsField(source='cover_art')`.
+    """
+    # Also read by the field, for SparseFieldsetMixin's column projection.
+    extra_source_columns = ('image_renditions',)
+
+    def get_attribute(self, instance):
+        fieldfile = super().get_attribute(instance)
+        owner = instance
+        for attr in self.source_attrs[:-1]:
+            owner = getattr(owner, attr)
+        rendered = getattr(owner, 'image_renditions', None) or {}
+        return fieldfile, rendered.get(self.source_attrs[-1])
+
+    def to_representation(self, value):
+        fieldfile, rendered_name = value
+        return rendition_urls(fieldfile, rendered_name)
+
+
+def _render(image, variant):
+    width, height, crop = RENDITIONS[variant]
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail((width, height), Image.LANCZOS)
+    return resized
+
+
+def generate_renditions(fieldfile):
+    """Write every variant of `fieldfile` to its storage, replacing old ones."""
+    if not fieldfile:
+        return 0
+    storage = fieldfile.storage
+    with storage.open(fieldfile.name, 'rb') as handle:
+        image = Image.open(handle)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    written = 0
+    for variant in RENDITIONS:
+        rendered = _render(image, variant)
+        for fmt, (pil_format, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            rendered.save(buffer, pil_format, **options)
+            name = rendition_name(fieldfile.name, variant, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+            written += 1
+    return written
+
+
+def record_renditions(model, pk, rendered):
+    """
+    Record in `image_renditions` that the files in `rendered` (field name ->
+    file name) now have renditions. Saved through the model, with its
+    timestamp where it has one, so cached payloads and ETags move on.
+    """
+    with transaction.atomic():
+        instance = model._base_manager.select_for_update().filter(pk=pk).first()
+        if instance is None:
+            return
+        instance.image_renditions = {**instance.image_renditions, **rendered}
+        update_fields = ['image_renditions']
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            update_fields.append('updated_at')
+        instance.save(update_fields=update_fields)
+
+
+def _generate_for_instance(model_label, pk, field_names):
+    try:
+        model = apps.get_model(model_label)
+        instance = model._base_manager.filter(pk=pk).first()
+        if instance is None:
+            return
+        rendered = {}
+        for field_name in field_names:
+            fieldfile = getattr(instance, field_name)
+            try:
+                if generate_renditions(fieldfile):
+                    rendered[field_name] = fieldfile.name
+            except Exception:
+                logger.exception(f"Failed to render {model_label}.{field_name} for pk={pk}")
+        if rendered:
+            record_renditions(model, pk, rendered)
+    finally:
+        # Worker threads get their own DB connection; don't leak it.
+        connection.close()
+
+
+def schedule_renditions(instance, field_names):
+    """
+    Generate renditions for `field_names` of `instance` on a background thread
+    once the current transaction commits, keeping Pillow work out of the
+    request thread.
+    """
+    if not field_names:
+        return
+    model_label = instance._meta.label
+    pk = instance.pk
+    field_names = list(field_names)
+    transaction.on_commit(lambda: _executor.submit(_generate_for_instance, model_label, pk, field_names))
+
+
+def remember_image_names(instance, field_names):
+    """Record the loaded file names so `changed_image_fields` can detect uploads."""
+    deferred = instance.get_deferred_fields()
+    instance._loaded_image_names = {
+        field_name: getattr(instance, field_name).name
+        for field_name in field_names
+        if field_name not in deferred
+    }
+
+
+def changed_image_fields(instance, field_names, created=False):
+    loaded = getattr(instance, '_loaded_image_names', {})
+    changed = []
+    for field_name in field_names:
+        if field_name in instance.get_deferred_fields():
+            continue
+        name = getattr(instance, field_name).name
+        if name and (created or loaded.get(field_name) != name):
+            changed.append(field_name)
+    return changed
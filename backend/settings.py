@@ -115,6 +115,32 @@ DATABASES = {
     )
 }
 
+# -----------------------------
+# 📌 CACHE CONFIG
+# -----------------------------
+# Redis is used when REDIS_URL is set; otherwise each process falls back to
+# its own local-memory cache so cached views keep working without Redis.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'uzinduzi',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'uzinduzi-default',
+        }
+    }
+
+# Seconds a cached catalog payload may live before it is rebuilt even if no
+# catalog change bumped the version key.
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=60 * 15, cast=int)
+
 # -----------------------------
 # 📌 PASSWORD VALIDATORS
 # -----------------------------
@@ -143,6 +169,9 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
 
+# Background threads used to generate image renditions after upload.
+IMAGE_RENDITION_WORKERS = config('IMAGE_RENDITION_WORKERS', default=2, cast=int)
+
 # -----------------------------
 # 📌 AUTH
 # -----------------------------
@@ -215,6 +244,24 @@ PESEPAY_INTEGRATION_KEY = config('PESEPAY_INTEGRATION_KEY')
 PESEPAY_ENCRYPTION_KEY = config('PESEPAY_ENCRYPTION_KEY')
 PESEPAY_RETURN_URL = config('PESEPAY_RETURN_URL')
 PESEPAY_RESULT_URL = config('PESEPAY_RESULT_URL')
+# HTTP client used for every Pesepay call (see payments.gateway).
+PESEPAY_CONNECT_TIMEOUT = config('PESEPAY_CONNECT_TIMEOUT', default=3.05, cast=float)
+PESEPAY_READ_TIMEOUT = config('PESEPAY_READ_TIMEOUT', default=20, cast=float)
+PESEPAY_MAX_RETRIES = config('PESEPAY_MAX_RETRIES', default=2, cast=int)
+PESEPAY_POOL_SIZE = config('PESEPAY_POOL_SIZE', default=10, cast=int)
+# Status polling (see payments.status): upstream answers are shared for this
+# many seconds, and final-status responses are cached for a day.
+PAYMENT_STATUS_POLL_INTERVAL = config('PAYMENT_STATUS_POLL_INTERVAL', default=3, cast=int)
+PAYMENT_FINAL_STATUS_CACHE_TIMEOUT = config('PAYMENT_FINAL_STATUS_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+# Write PaymentLog rows from a background thread after commit instead of
+# inside the request's transaction (see payments.eventlog).
+PAYMENT_EVENT_LOG_ASYNC = config('PAYMENT_EVENT_LOG_ASYNC', default=False, cast=bool)
+# PaymentLog retention (see payments.archive): older months are moved to
+# gzip JSONL archives on local disk, or in an S3-compatible bucket when one is set.
+PAYMENT_LOG_RETENTION_MONTHS = config('PAYMENT_LOG_RETENTION_MONTHS', default=6, cast=int)
+PAYMENT_LOG_ARCHIVE_ROOT = config('PAYMENT_LOG_ARCHIVE_ROOT', default=str(BASE_DIR / 'archives'))
+PAYMENT_LOG_ARCHIVE_BUCKET = config('PAYMENT_LOG_ARCHIVE_BUCKET', default='')
+PAYMENT_LOG_ARCHIVE_ENDPOINT_URL = config('PAYMENT_LOG_ARCHIVE_ENDPOINT_URL', default='')
 
 # -----------------------------
 # 📌 APP DOMAIN
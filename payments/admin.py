@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import *
+from .status import forget_final_responses
+from .broadcast import publish_status_change, status_event
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -75,18 +77,28 @@ class PaymentAdmin(admin.ModelAdmin):
     is_paid.boolean = True
     is_paid.short_description = 'Paid'
     
+    def _set_status(self, queryset, new_status):
+        # Bulk updates skip post_save, so drop cached status-poll responses
+        # and notify waiting status streams here.
+        reference_numbers = list(queryset.values_list('reference_number', flat=True))
+        updated = queryset.update(status=new_status)
+        forget_final_responses(*reference_numbers)
+        for reference_number in reference_numbers:
+            publish_status_change(status_event(reference_number, new_status))
+        return updated
+
     def mark_as_success(self, request, queryset):
-        updated = queryset.update(status='SUCCESS')
+        updated = self._set_status(queryset, 'SUCCESS')
         self.message_user(request, f"{updated} payments marked as SUCCESS.")
     mark_as_success.short_description = "Mark selected payments as SUCCESS"
     
     def mark_as_failed(self, request, queryset):
-        updated = queryset.update(status='FAILED')
+        updated = self._set_status(queryset, 'FAILED')
         self.message_user(request, f"{updated} payments marked as FAILED.")
     mark_as_failed.short_description = "Mark selected payments as FAILED"
     
     def mark_as_cancelled(self, request, queryset):
-        updated = queryset.update(status='CANCELLED')
+        updated = self._set_status(queryset, 'CANCELLED')
         self.message_user(request, f"{updated} payments marked as CANCELLED.")
     mark_as_cancelled.short_description = "Mark selected payments as CANCELLED"
     
@@ -126,6 +138,32 @@ class PaymentLogAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('payment')
     
     
+@admin.register(PaymentLogArchive)
+class PaymentLogArchiveAdmin(admin.ModelAdmin):
+    list_display = ['month', 'row_count', 'size', 'path', 'created_at']
+    readonly_fields = ['month', 'path', 'row_count', 'size', 'created_at']
+
+    def has_add_permission(self, request):
+        return False  # Archives are written by archive_payment_logs
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PaymentCallback)
+class PaymentCallbackAdmin(admin.ModelAdmin):
+    list_display = ['reference_number', 'transaction_status', 'outcome', 'received_at', 'processed_at']
+    list_filter = ['outcome', 'transaction_status']
+    search_fields = ['reference_number']
+    readonly_fields = ['reference_number', 'transaction_status', 'payload_hash', 'payload', 'received_at', 'processed_at', 'outcome']
+
+    def has_add_permission(self, request):
+        return False  # Written by PaymentResultView only
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(ToBeVerifiedPayment)
 class ToBeVerifiedPaymentAdmin(admin.ModelAdmin):
     list_display = ('payment', 'reason', 'created_at')
@@ -0,0 +1,141 @@
+"""
+PaymentLog retention and archive.
+
+`archive_month()` writes one month of PaymentLog rows to gzip-compressed JSON
+Lines in the archive storage, records a `PaymentLogArchive`, and then removes
+the rows. On a partitioned table that means dropping the month's partition
+(see payments.partitions); otherwise the rows are deleted in batches.
+
+Archives live on local disk under `PAYMENT_LOG_ARCHIVE_ROOT`. When
+`PAYMENT_LOG_ARCHIVE_BUCKET` is set they go to that S3-compatible bucket
+instead, at `PAYMENT_LOG_ARCHIVE_ENDPOINT_URL` if one is given.
+
+`archived_logs_for()` is the read path: it fetches only the archives from
+the months a payment was active in and streams through them, so archived
+history stays available on demand.
+"""
+import gzip
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from . import partitions
+from .models import PaymentLog, PaymentLogArchive
+
+ARCHIVE_FIELDS = ('id', 'payment_id', 'event_type', 'message', 'data', 'timestamp')
+
+EXPORT_CHUNK_SIZE = 2000
+DELETE_BATCH_SIZE = 5000
+
+
+def archive_storage():
+    if settings.PAYMENT_LOG_ARCHIVE_BUCKET:
+        from storages.backends.s3 import S3Storage
+
+        return S3Storage(
+            bucket_name=settings.PAYMENT_LOG_ARCHIVE_BUCKET,
+            endpoint_url=settings.PAYMENT_LOG_ARCHIVE_ENDPOINT_URL or None,
+            file_overwrite=False,
+            default_acl='private',
+        )
+    return FileSystemStorage(location=settings.PAYMENT_LOG_ARCHIVE_ROOT)
+
+
+def logs_in_month(month):
+    start, end = partitions.month_bounds(month)
+    return PaymentLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+
+
+def months_to_archive(keep_months):
+    """Months older than the newest `keep_months` that still hold PaymentLog rows."""
+    oldest = PaymentLog.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None:
+        return []
+    cutoff = partitions.add_months(partitions.month_start(timezone.now()), -keep_months)
+    months = []
+    month = partitions.month_start(oldest)
+    while month < cutoff:
+        months.append(month)
+        month = partitions.add_months(month, 1)
+    return months
+
+
+def _delete_rows(queryset):
+    while True:
+        batch = list(queryset.values_list('pk', flat=True)[:DELETE_BATCH_SIZE])
+        if not batch:
+            return
+        PaymentLog.objects.filter(pk__in=batch).delete()
+
+
+def archive_month(month, storage=None):
+    """
+    Archive and remove `month`'s PaymentLog rows. Returns the new
+    `PaymentLogArchive`, or None if the month had no rows.
+
+    Rows are only removed after the archive file is stored and recorded, so
+    an interrupted run loses nothing; the next run archives what is left.
+    """
+    storage = storage or archive_storage()
+    rows = logs_in_month(month).order_by('id').values(*ARCHIVE_FIELDS)
+
+    row_count = 0
+    with tempfile.TemporaryFile() as spool:
+        with gzip.GzipFile(fileobj=spool, mode='wb') as archive:
+            for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                archive.write((json.dumps(row, cls=DjangoJSONEncoder) + '\n').encode())
+                row_count += 1
+        if not row_count:
+            return None
+        size = spool.tell()
+        spool.seek(0)
+        name = f"payment_logs/{month:%Y-%m}/{timezone.now():%Y%m%dT%H%M%S}.jsonl.gz"
+        path = storage.save(name, File(spool, name=name))
+
+    record = PaymentLogArchive.objects.create(month=month, path=path, row_count=row_count, size=size)
+    if partitions.is_partitioned():
+        partitions.drop_partition(month)
+    # Catches rows that sat in the default partition, and unpartitioned tables.
+    _delete_rows(logs_in_month(month))
+    return record
+
+
+def read_archive(archive, storage=None):
+    """Yield the rows stored in `archive`, as dicts."""
+    storage = storage or archive_storage()
+    with storage.open(archive.path, 'rb') as stored, gzip.GzipFile(fileobj=stored) as lines:
+        for line in lines:
+            yield json.loads(line)
+
+
+def archived_logs_for(payment, storage=None):
+    """
+    Return `payment`'s archived log entries, newest first, shaped like
+    `PaymentLogSerializer` output.
+
+    Logs are written while a payment is being processed, so only archives from
+    its creation month to the month after its last update are read.
+    """
+    storage = storage or archive_storage()
+    archives = PaymentLogArchive.objects.filter(
+        month__gte=partitions.month_start(payment.created_at),
+        month__lte=partitions.add_months(partitions.month_start(payment.updated_at), 1),
+    )
+    payment_id = str(payment.pk)
+    # A retried month can hold a row in two archive parts; keep one copy.
+    entries = {}
+    for archive in archives:
+        for row in read_archive(archive, storage):
+            if row['payment_id'] == payment_id:
+                entries[row['id']] = {
+                    'event_type': row['event_type'],
+                    'message': row['message'],
+                    'data': row['data'],
+                    'timestamp': row['timestamp'],
+                }
+    return sorted(entries.values(), key=lambda entry: entry['timestamp'], reverse=True)
@@ -0,0 +1,109 @@
+"""
+Payment status change broadcasting.
+
+Every committed change to `Payment.status` is published as a small event, so
+the streaming endpoints in `payments.streams` can push it to waiting clients
+the moment it happens, whichever code path made the change.
+
+Events go through Redis pub/sub, since the change is usually saved by a
+WSGI process and the streams live in the ASGI one. Each ASGI process keeps a
+single pattern subscription and fans events out to its own connections in
+memory, so an idle client costs one queue, not one Redis connection. Without
+`REDIS_URL` nothing is published and the streaming endpoints are disabled.
+"""
+import asyncio
+import functools
+import json
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'payments:status-events:'
+
+PAID_STATUSES = ['SUCCESS', 'CashRecorded', 'COLLECTED']
+
+
+def status_event(reference_number, status):
+    return {
+        'reference_number': reference_number,
+        'status': status,
+        'paid': status in PAID_STATUSES,
+        'is_final_status': status in Payment.FINAL_STATUSES,
+    }
+
+
+@functools.cache
+def _redis():
+    import redis
+
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+def publish_status_change(event):
+    """Deliver `event` to every stream waiting on its payment. Never raises."""
+    if not event['reference_number'] or not settings.REDIS_URL:
+        return
+    try:
+        _redis().publish(CHANNEL_PREFIX + event['reference_number'], json.dumps(event))
+    except Exception:
+        # A broken broker must not fail the payment update; streams re-read
+        # the database on their next recheck.
+        logger.exception(f"Failed to publish status event for {event['reference_number']}")
+
+
+class StatusHub:
+    """
+    Per-process registry of the streams waiting on each payment reference.
+    Lives on the ASGI event loop; `subscribe`/`unsubscribe` must be called
+    from it.
+    """
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._listener = None
+
+    def subscribe(self, reference_number):
+        loop = asyncio.get_running_loop()
+        # A listener left on another (e.g. a closed test) loop never runs again.
+        if self._listener is None or self._listener.done() or self._listener.get_loop() is not loop:
+            self._listener = loop.create_task(self._listen())
+        queue = asyncio.Queue()
+        self._subscribers[reference_number].add(queue)
+        return queue
+
+    def unsubscribe(self, reference_number, queue):
+        queues = self._subscribers.get(reference_number)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[reference_number]
+
+    def dispatch(self, event):
+        for queue in self._subscribers.get(event['reference_number'], ()):
+            queue.put_nowait(event)
+
+    async def _listen(self):
+        import redis.asyncio
+
+        while True:
+            client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(CHANNEL_PREFIX + '*')
+                    async for message in pubsub.listen():
+                        if message['type'] == 'pmessage':
+                            self.dispatch(json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Payment status subscription failed; reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+hub = StatusHub()
@@ -0,0 +1,193 @@
+"""
+Pesepay result-callback ingestion.
+
+`PaymentResultView` only records each callback in the `PaymentCallback`
+inbox, with a single `INSERT ... ON CONFLICT DO NOTHING` keyed on
+(referenceNumber, transactionStatus, payload hash), and answers 200. Pesepay
+retries and duplicate deliveries hit the unique key and cost nothing more.
+
+`process_callbacks()` then applies pending callbacks in arrival order. Each
+callback is applied once and marked processed in the same transaction as the
+payment change. A callback whose payment already has the target status is
+recorded as a duplicate instead of being re-applied, and one whose payment
+already settled with another final status is only logged. A callback that beats
+its payment's reference number to the database is matched through its
+merchant reference when it has one (see payments.initiation); otherwise it
+is parked as `UNKNOWN_PAYMENT` and requeued once the reference is saved.
+
+Processing runs in a background thread nudged by the view. The
+`process_payment_callbacks` command sweeps up anything left behind, e.g.
+after a restart.
+"""
+import hashlib
+import json
+import logging
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .eventlog import log_payment_event
+from .initiation import adopt_references
+from .models import Payment, PaymentCallback
+
+logger = logging.getLogger(__name__)
+
+# transactionStatus -> status the callback moves the payment to.
+CALLBACK_TRANSITIONS = {
+    'SUCCESS': 'SUCCESS',
+    'COMPLETED': 'SUCCESS',
+    'FAILED': 'FAILED',
+    'CANCELLED': 'FAILED',
+}
+TRANSITION_METHODS = {
+    'SUCCESS': Payment.mark_as_success,
+    'FAILED': Payment.mark_as_failed,
+}
+
+APPLIED = 'APPLIED'
+DUPLICATE = 'DUPLICATE'
+RECORDED = 'RECORDED'
+UNKNOWN_PAYMENT = 'UNKNOWN_PAYMENT'
+
+PROCESS_BATCH_SIZE = 100
+
+
+def payload_hash(payload):
+    encoded = json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def record_callback(payload):
+    """Add a callback to the inbox; an identical callback already there is left as is."""
+    PaymentCallback.objects.bulk_create(
+        [PaymentCallback(
+            reference_number=str(payload['referenceNumber']),
+            transaction_status=str(payload.get('transactionStatus') or '').upper(),
+            payload_hash=payload_hash(payload),
+            payload=payload,
+        )],
+        ignore_conflicts=True,
+    )
+
+
+def requeue_unmatched(reference_number):
+    """
+    Put back callbacks that arrived before their payment's reference number
+    was stored, so they are applied now that it is.
+    """
+    requeued = PaymentCallback.objects.filter(
+        reference_number=reference_number, outcome=UNKNOWN_PAYMENT,
+    ).update(processed_at=None, outcome='')
+    if requeued:
+        transaction.on_commit(callback_processor.nudge)
+    return requeued
+
+
+def apply_callback(callback, payment):
+    """Apply one callback to its (locked) payment and return the outcome."""
+    if payment is None:
+        return UNKNOWN_PAYMENT
+    log_payment_event(
+        payment=payment,
+        event_type='RESULT',
+        message='Payment result received from Pesepay',
+        data=callback.payload,
+    )
+    target = CALLBACK_TRANSITIONS.get(callback.transaction_status)
+    if target is None:
+        return RECORDED
+    if payment.status == target:
+        return DUPLICATE
+    if payment.status in Payment.FINAL_STATUSES:
+        # A late retry of an older delivery must not reopen a settled payment.
+        return RECORDED
+    TRANSITION_METHODS[target](payment)
+    return APPLIED
+
+
+def process_callbacks(batch_size=PROCESS_BATCH_SIZE):
+    """
+    Apply up to `batch_size` pending callbacks, oldest first. Returns how many
+    were processed. Safe to run from several workers at once: callbacks are
+    claimed with SKIP LOCKED, and a payment whose earlier callback is held by
+    another worker is left alone until that one is done, so each payment sees
+    its callbacks in order.
+    """
+    with transaction.atomic():
+        pending = list(
+            PaymentCallback.objects.filter(processed_at__isnull=True)
+            .select_for_update(skip_locked=True)
+            .order_by('id')[:batch_size]
+        )
+        if not pending:
+            return 0
+
+        first_claimed = {}
+        for callback in pending:
+            first_claimed.setdefault(callback.reference_number, callback.pk)
+        held_elsewhere = (
+            PaymentCallback.objects.filter(processed_at__isnull=True, reference_number__in=first_claimed)
+            .exclude(pk__in=[callback.pk for callback in pending])
+            .values_list('reference_number', 'pk')
+        )
+        blocked = {reference for reference, pk in held_elsewhere if pk < first_claimed[reference]}
+
+        payments = {
+            payment.reference_number: payment
+            for payment in Payment.objects.select_for_update()
+            .filter(reference_number__in=set(first_claimed) - blocked)
+            .order_by('pk')
+        }
+        # Payments whose initiation never recorded the reference number are
+        # found through the merchant reference Pesepay echoes back.
+        unmatched = {
+            str(callback.payload['merchantReference']): callback.reference_number
+            for callback in pending
+            if callback.reference_number not in payments and callback.reference_number not in blocked
+            and callback.payload.get('merchantReference')
+        }
+        if unmatched:
+            payments.update(adopt_references(unmatched))
+
+        now = timezone.now()
+        processed = []
+        for callback in pending:
+            if callback.reference_number in blocked:
+                continue
+            callback.outcome = apply_callback(callback, payments.get(callback.reference_number))
+            callback.processed_at = now
+            processed.append(callback)
+        PaymentCallback.objects.bulk_update(processed, ['outcome', 'processed_at'])
+    return len(processed)
+
+
+class CallbackProcessor:
+    """Background thread that drains the inbox whenever it is nudged."""
+    def __init__(self):
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def nudge(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='payment-callbacks', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                close_old_connections()
+                while process_callbacks():
+                    pass
+            except Exception:
+                # Left pending; the next nudge or process_payment_callbacks retries.
+                logger.exception("Failed to process payment callbacks")
+
+
+callback_processor = CallbackProcessor()
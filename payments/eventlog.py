@@ -0,0 +1,182 @@
+"""
+Buffered PaymentLog writer.
+
+A payment request used to write each PaymentLog row with its own INSERT
+inside the request's transaction. `PaymentEventBuffer` replaces that
+`transaction.atomic()` block: events logged inside it are kept in memory and
+written with one `bulk_create` as the last statement of the same
+transaction, so they commit exactly when the payment changes they describe
+commit, and are dropped with them on rollback.
+
+With `PAYMENT_EVENT_LOG_ASYNC` enabled the buffered events are instead
+handed to a background flusher once the transaction has committed, taking the
+log write off the request path entirely. When the flusher's queue is full the
+events are written synchronously, and the queue, including the batch being
+written, is drained when the process exits. A batch that still fails after
+`MAX_WRITE_ATTEMPTS` is written one event at a time, so a bad event (e.g. for
+a since-deleted payment) is logged and dropped instead of holding up every
+event behind it. A hard crash can still lose events waiting in the queue,
+which is why the transactional mode is the default.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import PaymentLog
+
+logger = logging.getLogger(__name__)
+
+# Request fields worth keeping in a CREATED event; the full request body may
+# carry card details and other required fields that should not be stored.
+LOGGED_REQUEST_FIELDS = (
+    'amount', 'currency_code', 'payment_method_code', 'payment_reason',
+    'album_title', 'artist_name', 'plaque_type',
+)
+
+FLUSH_BATCH_SIZE = 500
+MAX_WRITE_ATTEMPTS = 3
+
+
+def summarize_request(data):
+    return {field: data.get(field) for field in LOGGED_REQUEST_FIELDS if field in data}
+
+
+def _write(events):
+    PaymentLog.objects.bulk_create(events, batch_size=FLUSH_BATCH_SIZE)
+
+
+def _write_each(events):
+    """Write events one at a time, dropping (and logging) any that fail."""
+    for event in events:
+        try:
+            PaymentLog.objects.bulk_create([event])
+        except Exception:
+            logger.exception(
+                f"Dropping {event.event_type} payment event for payment {event.payment_id}: {event.data!r}"
+            )
+
+
+class PaymentEventFlusher:
+    """Background thread that writes handed-off events in batches."""
+    def __init__(self, max_pending=10000, interval=0.5):
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        # Held while a batch is taken off the queue and written, so drain()
+        # never misses a batch the thread is holding.
+        self._writing = threading.Lock()
+        self._draining = False
+        self._thread = None
+
+    def submit(self, events):
+        self._ensure_started()
+        for position, event in enumerate(events):
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                logger.warning("Payment event queue is full; writing events synchronously")
+                _write(events[position:])
+                return
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='payment-event-flusher', daemon=True)
+                self._thread.start()
+
+    def _take_batch(self, timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < FLUSH_BATCH_SIZE:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _flush(self, batch):
+        for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+            try:
+                close_old_connections()
+                _write(batch)
+                return
+            except Exception:
+                logger.exception(
+                    f"Failed to write {len(batch)} payment events (attempt {attempt}/{MAX_WRITE_ATTEMPTS})"
+                )
+                if attempt < MAX_WRITE_ATTEMPTS:
+                    time.sleep(self.interval * 2 ** (attempt - 1))
+        _write_each(batch)
+
+    def _run(self):
+        # Steps aside for drain(), which would otherwise race this loop for the lock.
+        while not self._draining:
+            with self._writing:
+                batch = self._take_batch(self.interval)
+                if batch:
+                    self._flush(batch)
+
+    def drain(self):
+        """
+        Write everything still queued, from the calling thread, after the
+        batch the background thread is writing, if any.
+        """
+        self._draining = True
+        try:
+            with self._writing:
+                while batch := self._take_batch(timeout=0):
+                    self._flush(batch)
+        finally:
+            self._draining = False
+
+
+flusher = PaymentEventFlusher()
+atexit.register(flusher.drain)
+
+
+def _hand_off(events):
+    if settings.PAYMENT_EVENT_LOG_ASYNC:
+        transaction.on_commit(lambda: flusher.submit(events))
+    else:
+        _write(events)
+
+
+def log_payment_event(payment, event_type, message, data=None):
+    """Record a single event outside a `PaymentEventBuffer`."""
+    _hand_off([PaymentLog(payment=payment, event_type=event_type, message=message, data=data or {})])
+
+
+class PaymentEventBuffer:
+    """
+    `transaction.atomic()` that also collects PaymentLog events and writes
+    them in one statement just before the transaction commits::
+
+        with PaymentEventBuffer() as events:
+            payment = Payment.objects.create(...)
+            events.log(payment, 'CREATED', 'Payment record created')
+    """
+    def __init__(self, using=None):
+        self.events = []
+        self._atomic = transaction.atomic(using=using)
+
+    def log(self, payment, event_type, message, data=None):
+        self.events.append(PaymentLog(payment=payment, event_type=event_type, message=message, data=data or {}))
+
+    def __enter__(self):
+        self._atomic.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.events:
+            try:
+                _hand_off(self.events)
+            except Exception as exc:
+                # Roll back with the write error so payment and log stay in step.
+                self._atomic.__exit__(type(exc), exc, exc.__traceback__)
+                raise
+        return self._atomic.__exit__(exc_type, exc_value, traceback)
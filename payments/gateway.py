@@ -0,0 +1,181 @@
+"""
+Pesepay gateway.
+
+Every call to Pesepay, whether made through the `pesepay` SDK or the raw REST
+API, goes through one pooled `requests.Session` per process. The session keeps
+TLS connections alive between calls, applies connect/read timeouts so a slow
+Pesepay response cannot pin a worker, and retries transient failures with
+jittered exponential backoff. Each call's latency is logged and aggregated in
+`latency_snapshot()`.
+
+Only idempotent requests (GET) are retried after the request was sent; POSTs
+that create payments are retried only when the connection could not be
+established, so a payment is never submitted twice.
+"""
+import functools
+import logging
+import threading
+import time
+
+import pesepay.pesepay as pesepay_sdk
+import requests
+from django.conf import settings
+from pesepay import Pesepay
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_BY_REFERENCE_URL = pesepay_sdk.BASE_URL + '/v1/transactions/by-reference'
+
+
+class TimeoutSession(requests.Session):
+    """A Session that applies a default `(connect, read)` timeout to every request."""
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def build_session():
+    retry = Retry(
+        total=settings.PESEPAY_MAX_RETRIES,
+        connect=settings.PESEPAY_MAX_RETRIES,
+        read=settings.PESEPAY_MAX_RETRIES,
+        status=settings.PESEPAY_MAX_RETRIES,
+        allowed_methods=frozenset({'GET'}),
+        status_forcelist=(429, 502, 503, 504),
+        backoff_factor=0.3,
+        backoff_jitter=0.3,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.PESEPAY_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = TimeoutSession(timeout=(settings.PESEPAY_CONNECT_TIMEOUT, settings.PESEPAY_READ_TIMEOUT))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class _SDKRequests:
+    """
+    Stand-in for the `requests` module inside the pesepay SDK, which calls
+    `requests.get`/`requests.post` directly. Routing them through our session
+    gives SDK calls the same pool, timeouts and retries.
+    """
+    def __init__(self, session):
+        self._session = session
+
+    def get(self, url, **kwargs):
+        return self._session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._session.post(url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+class LatencyRecorder:
+    """Thread-safe per-operation call counts, error counts and latency totals."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, operation, elapsed_ms, failed):
+        with self._lock:
+            stats = self._stats.setdefault(operation, {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['calls'] += 1
+            stats['errors'] += int(failed)
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                operation: {
+                    'calls': stats['calls'],
+                    'errors': stats['errors'],
+                    'avg_ms': round(stats['total_ms'] / stats['calls'], 1),
+                    'max_ms': round(stats['max_ms'], 1),
+                }
+                for operation, stats in self._stats.items()
+            }
+
+
+latency = LatencyRecorder()
+
+
+def latency_snapshot():
+    return latency.snapshot()
+
+
+class PesepayGateway:
+    """Thin wrapper over the Pesepay SDK plus the raw REST endpoints we use."""
+
+    def __init__(self, session=None):
+        self.session = session or build_session()
+        pesepay_sdk.requests = _SDKRequests(self.session)
+        self.client = Pesepay(settings.PESEPAY_ENCRYPTION_KEY, settings.PESEPAY_INTEGRATION_KEY)
+        self.client.result_url = settings.PESEPAY_RESULT_URL
+        self.client.return_url = settings.PESEPAY_RETURN_URL
+
+    def _timed(self, operation, func, *args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            latency.record(operation, elapsed_ms, failed)
+            logger.info(f"Pesepay {operation} took {elapsed_ms:.1f}ms{' (failed)' if failed else ''}")
+
+    # SDK object builders: no network access.
+    def create_payment(self, currency_code, payment_method_code, email=None, phone=None, name=None):
+        return self.client.create_payment(currency_code, payment_method_code, email, phone, name)
+
+    def create_transaction(self, amount, currency_code, payment_reason, merchant_reference=None):
+        return self.client.create_transaction(amount, currency_code, payment_reason, merchant_reference)
+
+    # Network calls.
+    def make_seamless_payment(self, payment, reason_for_payment, amount, required_fields=None):
+        return self._timed(
+            'make_seamless_payment', self.client.make_seamless_payment,
+            payment, reason_for_payment, amount, required_fields,
+        )
+
+    def initiate_transaction(self, transaction):
+        return self._timed('initiate_transaction', self.client.initiate_transaction, transaction)
+
+    def check_payment(self, reference_number):
+        return self._timed('check_payment', self.client.check_payment, reference_number)
+
+    def get_transaction_by_reference(self, reference_number):
+        """Fetch a transaction's raw JSON; raises `requests.HTTPError` on a non-2xx reply."""
+        def fetch():
+            response = self.session.get(
+                TRANSACTION_BY_REFERENCE_URL,
+                headers={
+                    'authorization': settings.PESEPAY_INTEGRATION_KEY,
+                    'content-type': 'application/json',
+                },
+                params={'referenceNumber': reference_number},
+            )
+            response.raise_for_status()
+            return response.json()
+        return self._timed('transaction_by_reference', fetch)
+
+
+@functools.cache
+def get_gateway():
+    """The process-wide gateway, built on first use."""
+    return PesepayGateway()
@@ -0,0 +1,131 @@
+"""
+Two-phase payment initiation.
+
+Creating a Pesepay payment used to happen inside one `transaction.atomic()`
+that also wrapped the Pesepay round trips, holding a pooled connection and
+the new row's locks for the whole remote call. It now runs as:
+
+1. `reserve_payment()`: a short transaction that inserts the `INITIATED`
+   Payment and its CREATED event. The payment's id is also its Pesepay
+   merchant reference.
+2. The gateway calls, made by the view with no transaction open.
+3. `record_initiated()` or `record_failure()`: a second short transaction
+   that stores the outcome.
+
+A payment whose process died between phases 1 and 3 is left `INITIATED`
+with no reference number. If Pesepay did create it, its result callback
+carries the merchant reference, and `adopt_references()` attaches the
+reference number to the payment. Otherwise `sweep_orphans()`, run by the
+reconciliation worker, marks it `ERROR` after `ORPHAN_GRACE`.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .broadcast import publish_status_change, status_event
+from .eventlog import PaymentEventBuffer
+from .models import Payment
+from .status import forget_final_responses
+
+# Far longer than any gateway call can take with the configured timeouts.
+ORPHAN_GRACE = timedelta(minutes=getattr(settings, 'PAYMENT_ORPHAN_GRACE_MINUTES', 10))
+ORPHANED_STATUS = 'ERROR'
+SWEEP_BATCH_SIZE = 500
+
+
+def reserve_payment(message, data, **fields):
+    """Phase 1: insert the payment and log its creation."""
+    with PaymentEventBuffer() as events:
+        payment = Payment(**fields)
+        payment.pesepay_merchant_reference = str(payment.id)
+        payment.save()
+        events.log(payment=payment, event_type='CREATED', message=message, data=data)
+    return payment
+
+
+def record_initiated(payment, response, message, data):
+    """Phase 3: store the Pesepay reference and URLs of an initiated payment."""
+    with PaymentEventBuffer() as events:
+        payment = Payment.objects.select_for_update().get(pk=payment.pk)
+        payment.reference_number = response.referenceNumber
+        payment.poll_url = getattr(response, 'pollUrl', None)
+        payment.redirect_url = getattr(response, 'redirectUrl', None)
+        update_fields = ['reference_number', 'poll_url', 'redirect_url', 'updated_at']
+        if payment.status == ORPHANED_STATUS:
+            # Swept while the gateway call was still running; it is live after all.
+            payment.status = 'INITIATED'
+            update_fields.append('status')
+        payment.save(update_fields=update_fields)
+        events.log(payment=payment, event_type='PESEPAY_SUCCESS', message=message, data=data)
+    return payment
+
+
+def record_failure(payment, event_type, message, data):
+    """Phase 3: mark a payment Pesepay rejected, or could not be reached for, as failed."""
+    with PaymentEventBuffer() as events:
+        payment.mark_as_failed()
+        events.log(payment=payment, event_type=event_type, message=message, data=data)
+
+
+def adopt_references(merchant_references):
+    """
+    Attach Pesepay reference numbers to payments that never got theirs
+    recorded. `merchant_references` maps merchant reference to reference
+    number. Must run inside a transaction; returns the adopted payments,
+    locked, keyed by reference number.
+    """
+    adopted = {}
+    orphans = (
+        Payment.objects.select_for_update()
+        .filter(pesepay_merchant_reference__in=list(merchant_references), reference_number__isnull=True)
+        .order_by('pk')
+    )
+    for payment in orphans:
+        payment.reference_number = merchant_references[payment.pesepay_merchant_reference]
+        update_fields = ['reference_number', 'updated_at']
+        if payment.status == ORPHANED_STATUS:
+            payment.status = 'INITIATED'
+            update_fields.append('status')
+        payment.save(update_fields=update_fields)
+        adopted[payment.reference_number] = payment
+    return adopted
+
+
+def sweep_orphans(batch_size=SWEEP_BATCH_SIZE):
+    """
+    Mark payments stuck between the two initiation phases for longer than
+    `ORPHAN_GRACE` as `ERROR`. Returns how many were swept.
+    """
+    now = timezone.now()
+    with PaymentEventBuffer() as events:
+        orphans = list(
+            Payment.objects.select_for_update(skip_locked=True)
+            .filter(status='INITIATED', reference_number__isnull=True, created_at__lt=now - ORPHAN_GRACE)
+            .exclude(payment_method='CASH001')
+            .order_by('created_at')[:batch_size]
+        )
+        if not orphans:
+            return 0
+        Payment.objects.filter(pk__in=[payment.pk for payment in orphans]).update(
+            status=ORPHANED_STATUS, updated_at=now,
+        )
+        for payment in orphans:
+            events.log(
+                payment=payment,
+                event_type='ORPHANED',
+                message='Payment never received a Pesepay reference number',
+                data={'created_at': payment.created_at.isoformat()},
+            )
+        # The bulk update skips post_save, so drop cached status-poll
+        # responses and notify waiting status streams here once committed.
+        reference_numbers = [payment.reference_number for payment in orphans]
+        transaction.on_commit(lambda: _announce_status(reference_numbers, ORPHANED_STATUS))
+    return len(orphans)
+
+
+def _announce_status(reference_numbers, status):
+    forget_final_responses(*reference_numbers)
+    for reference_number in reference_numbers:
+        publish_status_change(status_event(reference_number, status))
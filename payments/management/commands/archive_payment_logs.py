@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payments import partitions
+from payments.archive import archive_month, archive_storage, logs_in_month, months_to_archive
+
+
+class Command(BaseCommand):
+    help = "Move PaymentLog rows older than the retention window to gzip-compressed JSONL archives."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months', type=int, default=settings.PAYMENT_LOG_RETENTION_MONTHS,
+            help="Full months of logs to keep in the database, besides the current one.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="List the months that would be archived.")
+
+    def handle(self, *args, **options):
+        if partitions.is_partitioned() and not options['dry_run']:
+            partitions.ensure_partitions()
+
+        storage = archive_storage()
+        archived = 0
+        for month in months_to_archive(options['keep_months']):
+            if options['dry_run']:
+                count = logs_in_month(month).count()
+                if count:
+                    self.stdout.write(f"{month:%Y-%m}: {count} row(s)")
+                continue
+            record = archive_month(month, storage=storage)
+            if record is not None:
+                archived += record.row_count
+                self.stdout.write(f"{month:%Y-%m}: archived {record.row_count} row(s) to {record.path}")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} payment log row(s)."))
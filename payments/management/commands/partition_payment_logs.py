@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payments import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert PaymentLog to monthly range partitions (PostgreSQL) and create upcoming partitions. "
+        "--convert locks and rewrites the whole table; run it in a maintenance window."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help="Convert the existing table if it is not partitioned yet.")
+        parser.add_argument('--ahead', type=int, default=3, help="Months of partitions to create ahead of the current one.")
+
+    def handle(self, *args, **options):
+        if not partitions.supported():
+            raise CommandError("PaymentLog partitioning requires PostgreSQL.")
+
+        if not partitions.is_partitioned():
+            if not options['convert']:
+                raise CommandError("PaymentLog is not partitioned yet; rerun with --convert.")
+            moved = partitions.convert_to_partitioned(months_ahead=options['ahead'])
+            self.stdout.write(f"Converted PaymentLog to monthly partitions ({moved} row(s) moved).")
+
+        partitions.ensure_partitions(months_ahead=options['ahead'])
+        self.stdout.write(self.style.SUCCESS(f"PaymentLog has {len(partitions.partitions())} partition(s)."))
@@ -0,0 +1,43 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from payments.callbacks import PROCESS_BATCH_SIZE, process_callbacks
+
+
+class Command(BaseCommand):
+    help = "Apply pending Pesepay result callbacks from the inbox. Safe to run several workers at once."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain pending callbacks once and exit.")
+        parser.add_argument('--batch-size', type=int, default=PROCESS_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when nothing is pending.")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        total = 0
+        while not self.stopping:
+            close_old_connections()
+            processed = process_callbacks(options['batch_size'])
+            total += processed
+            if processed:
+                self.stdout.write(f"Processed {processed} callback(s).")
+                continue
+            if options['once']:
+                break
+            self.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {total} callback(s) processed."))
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(min(0.5, deadline - time.monotonic()))
@@ -0,0 +1,54 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from payments.initiation import sweep_orphans
+from payments.reconciliation import reconcile_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcile non-final Pesepay payments in the background and sweep payments orphaned during "
+        "initiation. Safe to run several workers at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process due payments once and exit.")
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--concurrency', type=int, default=8, help="Concurrent Pesepay lookups per batch.")
+        parser.add_argument('--interval', type=float, default=10.0, help="Seconds to sleep when nothing is due.")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        total_claimed = total_updated = 0
+        while not self.stopping:
+            close_old_connections()
+            swept = sweep_orphans()
+            if swept:
+                self.stdout.write(f"Marked {swept} orphaned payment(s) as ERROR.")
+            claimed, updated = reconcile_batch(options['batch_size'], options['concurrency'])
+            total_claimed += claimed
+            total_updated += updated
+            if claimed:
+                self.stdout.write(f"Reconciled {updated}/{claimed} payment(s).")
+                # A full batch means more may be due right away.
+                if claimed == options['batch_size']:
+                    continue
+            if options['once']:
+                break
+            self.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {total_updated}/{total_claimed} payment(s) reconciled."))
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(min(0.5, deadline - time.monotonic()))
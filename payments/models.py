@@ -5,6 +5,8 @@ import uuid
 import json
 import logging
 
+from albums.tiers import PAYMENT_PLAQUE_TYPE, plaque_type_for_amount
+
 logger = logging.getLogger(__name__)
 
 class Payment(models.Model):
@@ -44,6 +46,14 @@ class Payment(models.Model):
         ('DELIVERED', 'Delivered'),
     ]
 
+    # Statuses after which PesePay will not change the payment again
+    FINAL_STATUSES = [
+        'AUTHORIZATION_FAILED', 'CANCELLED', 'CLOSED', 'CLOSED_PERIOD_ELAPSED',
+        'DECLINED', 'ERROR', 'FAILED', 'INSUFFICIENT_FUNDS', 'REVERSED',
+        'SERVICE_UNAVAILABLE', 'SUCCESS', 'TERMINATED', 'TIME_OUT',
+        'COLLECTED', 'DELIVERED',
+    ]
+
     # Currency choices
     CURRENCY_CHOICES = [
         ('USD', 'US Dollar'),
@@ -99,6 +109,10 @@ class Payment(models.Model):
     album_title = models.CharField(max_length=255, blank=True, null=True)
     artist_name = models.CharField(max_length=255, blank=True, null=True)
     plaque_type = models.CharField(max_length=100, choices=PLAQUE_TYPE_CHOICES, blank=True, null=True)
+
+    # Background reconciliation (see payments.reconciliation)
+    next_reconcile_at = models.DateTimeField(blank=True, null=True)
+    reconcile_attempts = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-created_at']
@@ -111,11 +125,19 @@ class Payment(models.Model):
             models.Index(fields=['plaque_type']),
             models.Index(fields=['pesepay_transaction_id']),
             models.Index(fields=['pesepay_merchant_reference']),
+            models.Index(fields=['status', 'next_reconcile_at']),
         ]
 
     def __str__(self):
         ref = self.reference_number or f"Payment-{str(self.id)[:8]}"
         return f"Payment {ref} - {self.amount} {self.currency} by {self.customer_email}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so post_save can tell whether the status actually changed.
+        instance._loaded_status = dict(zip(field_names, values)).get('status')
+        return instance
     
     def get_payment_method_display_name(self):
         """Get user-friendly payment method name"""
@@ -158,21 +180,7 @@ class Payment(models.Model):
     
     def get_plaque_type_by_amount(self):
         """Get the plaque type based on amount using ranges"""
-        amount = float(self.amount)
-        if amount < 51:
-            return "thank_you"
-        elif amount <= 100:
-            return "wood"
-        elif amount <= 300:
-            return "Gold"
-        elif amount <= 500:
-            return "Silver"
-        elif amount <= 700:
-            return "Emerald"
-        elif amount <= 900:
-            return "gold"
-        else:
-            return "emerald"
+        return plaque_type_for_amount(self.amount, PAYMENT_PLAQUE_TYPE)
     
     def validate_plaque_type(self):
         """Validate that plaque type matches the amount"""
@@ -250,52 +258,60 @@ class Payment(models.Model):
             merchant_reference = getattr(pesepay_response, 'merchantReference', self.pesepay_merchant_reference)
             paid = getattr(pesepay_response, 'paid', False)
 
+        from .eventlog import PaymentEventBuffer
+
         old_status = self.status
         valid_statuses = [choice[0] for choice in self.PAYMENT_STATUS_CHOICES]
 
-    # Update IDs & URLs
-        self.reference_number = reference_number
-        self.pesepay_transaction_id = transaction_id
-        self.pesepay_merchant_reference = merchant_reference
-        self.poll_url = getattr(pesepay_response, 'pollUrl', self.poll_url)
-        self.redirect_url = getattr(pesepay_response, 'redirectUrl', self.redirect_url)
+        with PaymentEventBuffer() as events:
+            # Update IDs & URLs
+            self.reference_number = reference_number
+            self.pesepay_transaction_id = transaction_id
+            self.pesepay_merchant_reference = merchant_reference
+            self.poll_url = getattr(pesepay_response, 'pollUrl', self.poll_url)
+            self.redirect_url = getattr(pesepay_response, 'redirectUrl', self.redirect_url)
 
-    # Normalize status
-        if pesepay_status in valid_statuses:
-            self.status = pesepay_status
-        else:
-          self.status = 'ERROR'
-          PaymentLog.objects.create(
-            payment=self,
-            event_type='UNKNOWN_STATUS',
-            message=f"Received unknown status from PesePay: {pesepay_status}",
-            data={'pesepay_response': str(pesepay_response)}
-        )
+            # Normalize status
+            if pesepay_status in valid_statuses:
+                self.status = pesepay_status
+            else:
+                self.status = 'ERROR'
+                events.log(
+                    payment=self,
+                    event_type='UNKNOWN_STATUS',
+                    message=f"Received unknown status from PesePay: {pesepay_status}",
+                    data={'pesepay_response': str(pesepay_response)}
+                )
 
-    # Handle success/failure timestamps
-        if self.status == 'SUCCESS':
-            self.completed_at = timezone.now()
-        elif self.status in [
-           'FAILED', 'CANCELLED', 'TIME_OUT', 'DECLINED', 'AUTHORIZATION_FAILED',
-           'CLOSED', 'CLOSED_PERIOD_ELAPSED', 'INSUFFICIENT_FUNDS',
-           'ERROR', 'TERMINATED'
-      ]:
-          self.completed_at = None
+            # Handle success/failure timestamps
+            if self.status == 'SUCCESS':
+                self.completed_at = timezone.now()
+            elif self.status in [
+                'FAILED', 'CANCELLED', 'TIME_OUT', 'DECLINED', 'AUTHORIZATION_FAILED',
+                'CLOSED', 'CLOSED_PERIOD_ELAPSED', 'INSUFFICIENT_FUNDS',
+                'ERROR', 'TERMINATED'
+            ]:
+                self.completed_at = None
 
-    # Auto-assign plaque if needed
-        if not self.plaque_type or not self.validate_plaque_type():
-           self.auto_assign_plaque_type()
+            # Auto-assign plaque if needed
+            if not self.plaque_type or not self.validate_plaque_type():
+                self.auto_assign_plaque_type()
 
-        self.save()
+            # Only the fields taken from the response, so concurrent changes
+            # to anything else are not overwritten with stale values.
+            self.save(update_fields=[
+                'reference_number', 'pesepay_transaction_id', 'pesepay_merchant_reference',
+                'poll_url', 'redirect_url', 'status', 'completed_at', 'plaque_type', 'updated_at',
+            ])
 
-    # Log status change
-        if old_status != self.status:
-             PaymentLog.objects.create(
-               payment=self,
-                event_type='STATUS_UPDATE',
-                message=f"Status changed from {old_status} → {self.status}",
-               data={'pesepay_response': str(pesepay_response)}
-        )
+            # Log status change
+            if old_status != self.status:
+                events.log(
+                    payment=self,
+                    event_type='STATUS_UPDATE',
+                    message=f"Status changed from {old_status} → {self.status}",
+                    data={'pesepay_response': str(pesepay_response)}
+                )
 
         print(f"✅ Payment {self.id} updated to status {self.status}")
 
@@ -321,6 +337,52 @@ class PaymentLog(models.Model):
         ref = self.payment.reference_number or f"Payment-{str(self.payment.id)[:8]}"
         return f"{ref} - {self.event_type} at {self.timestamp}"
     
+class PaymentLogArchive(models.Model):
+    """A month of PaymentLog rows moved to gzip-compressed JSONL storage (see payments.archive)"""
+    month = models.DateField(db_index=True)
+    path = models.CharField(max_length=500)
+    row_count = models.PositiveIntegerField()
+    size = models.PositiveBigIntegerField(help_text='Compressed size in bytes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-month', '-created_at']
+
+    def __str__(self):
+        return f"PaymentLog archive {self.month:%Y-%m} ({self.row_count} rows)"
+
+class PaymentCallback(models.Model):
+    """
+    Inbox of Pesepay result callbacks (see payments.callbacks). Retries and
+    duplicates of the same callback collapse onto one row.
+    """
+    reference_number = models.CharField(max_length=255)
+    transaction_status = models.CharField(max_length=50, blank=True)
+    payload_hash = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    outcome = models.CharField(max_length=20, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['reference_number', 'transaction_status', 'payload_hash'],
+                name='paymentcallback_dedupe_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['reference_number', 'id'], name='paymentcallback_ref_idx'),
+            models.Index(
+                fields=['id'], name='paymentcallback_pending_idx',
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.reference_number} - {self.transaction_status} ({self.outcome or 'pending'})"
+
 class ToBeVerifiedPayment(models.Model):
     payment = models.OneToOneField(
         'Payment',
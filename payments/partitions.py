@@ -0,0 +1,179 @@
+"""
+Monthly range partitions for PaymentLog (PostgreSQL only).
+
+`convert_to_partitioned()` turns the plain `payments_paymentlog` table into a
+table partitioned by `RANGE (timestamp)`, with one partition per calendar
+month (UTC) and a default partition catching anything outside them.
+`ensure_partitions()` creates the partitions for the coming months and must
+run regularly (`archive_payment_logs` does it on every run) so new rows never
+pile up in the default partition.
+
+With partitions, retiring a month of logs is a `DETACH PARTITION` plus a
+`DROP TABLE` instead of a long `DELETE` followed by an equally long vacuum.
+Partition pruning keeps the admin's `date_hierarchy` queries on the months
+they ask for.
+
+PostgreSQL requires a partitioned table's primary key to include the
+partition key, so the table's key becomes `(id, timestamp)`. `id` still comes
+from its identity sequence and stays unique, so Django keeps treating it as
+the primary key.
+"""
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import PaymentLog
+
+TABLE = PaymentLog._meta.db_table
+LEGACY_TABLE = f"{TABLE}_legacy"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    years, index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def month_bounds(month):
+    """The UTC `[start, end)` datetimes of `month`."""
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    end_month = add_months(month, 1)
+    return start, datetime(end_month.year, end_month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def supported():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    if not supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partitions():
+    """Names of the partitions currently attached to the PaymentLog table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.oid = to_regclass(%s)",
+            [TABLE],
+        )
+        return {name for (name,) in cursor.fetchall()}
+
+
+def _create_partition(cursor, month):
+    quote = connection.ops.quote_name
+    start, end = month_bounds(month)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote(partition_name(month))} PARTITION OF {quote(TABLE)} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """Create the partitions for this month and the next `months_ahead` months."""
+    current = month_start(today or timezone.now())
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            _create_partition(cursor, add_months(current, offset))
+
+
+def drop_partition(month):
+    """Detach and drop `month`'s partition. Returns False if it has none."""
+    name = partition_name(month)
+    if name not in partitions():
+        return False
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}")
+        cursor.execute(f"DROP TABLE {quote(name)}")
+    return True
+
+
+def _move_constraints_and_indexes(cursor):
+    """
+    Recreate the legacy table's primary key, foreign keys and indexes on the
+    new partitioned table under their original names, so Django's view of
+    the schema stays accurate.
+    """
+    quote = connection.ops.quote_name
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'f', 'u')",
+        [LEGACY_TABLE],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))",
+        [LEGACY_TABLE, LEGACY_TABLE],
+    )
+    indexes = cursor.fetchall()
+
+    for name, _, _ in constraints:
+        cursor.execute(f"ALTER TABLE {quote(LEGACY_TABLE)} DROP CONSTRAINT {quote(name)}")
+    for name, _ in indexes:
+        cursor.execute(f"DROP INDEX {quote(name)}")
+
+    for name, kind, definition in constraints:
+        if kind == 'p':
+            definition = f"PRIMARY KEY ({quote('id')}, {quote('timestamp')})"
+        elif kind == 'u':
+            # Unique constraints must include the partition key; none exist today.
+            continue
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}")
+    for name, definition in indexes:
+        if ' UNIQUE ' in definition:
+            continue
+        on_table = definition.index(' ON ')
+        using = definition.index(' USING ')
+        cursor.execute(f"{definition[:on_table]} ON {quote(TABLE)}{definition[using:]}")
+
+
+def convert_to_partitioned(months_ahead=3):
+    """
+    Rebuild the PaymentLog table as a monthly partitioned table and copy every
+    row into it, in one transaction holding an exclusive lock on the table.
+    Meant to be run once, in a maintenance window. Returns the number of rows
+    moved.
+    """
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT min({quote('timestamp')}), max({quote('id')}), count(*) FROM {quote(TABLE)}")
+        oldest, max_id, rows = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} RENAME TO {quote(LEGACY_TABLE)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(TABLE)} "
+            f"(LIKE {quote(LEGACY_TABLE)} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING STORAGE) "
+            f"PARTITION BY RANGE ({quote('timestamp')})"
+        )
+        _move_constraints_and_indexes(cursor)
+
+        current = month_start(timezone.now())
+        month = month_start(oldest) if oldest is not None else current
+        while month <= add_months(current, months_ahead):
+            _create_partition(cursor, month)
+            month = add_months(month, 1)
+        cursor.execute(f"CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {quote(TABLE)} SELECT * FROM {quote(LEGACY_TABLE)}")
+        cursor.execute(f"DROP TABLE {quote(LEGACY_TABLE)}")
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ALTER COLUMN {quote('id')} RESTART WITH %s", [(max_id or 0) + 1])
+    return rows
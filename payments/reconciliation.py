@@ -0,0 +1,139 @@
+"""
+Background reconciliation of non-final payments.
+
+Workers claim a batch of due payments in a short transaction using
+`SELECT ... FOR UPDATE SKIP LOCKED`, push each claimed row's
+`next_reconcile_at` past a lease, and commit. Rows locked by one worker are
+skipped by the others, and once committed the lease keeps the rows out of
+every other worker's claims, so any number of workers can run side by side
+without querying Pesepay twice for the same payment.
+
+Pesepay is then queried for the whole batch concurrently, bounded by
+`concurrency`, outside any transaction. Each result is applied with
+`Payment.update_from_pesepay_response` to the row re-read under
+`SELECT ... FOR UPDATE`; a payment that reached a final status in the
+meantime, e.g. through a result callback, is left as it is. Payments that are
+still pending are rescheduled with exponential backoff.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .gateway import get_gateway
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_STATUSES = ['INITIATED', 'PENDING', 'PROCESSING', 'PARTIALLY_PAID']
+
+# Leave brand-new payments to the browser's own polling for a little while.
+MIN_AGE = timedelta(seconds=getattr(settings, 'PAYMENT_RECONCILE_MIN_AGE_SECONDS', 30))
+# Pesepay closes abandoned payments long before this; stop asking after it.
+MAX_AGE = timedelta(days=getattr(settings, 'PAYMENT_RECONCILE_MAX_AGE_DAYS', 3))
+# Must comfortably exceed one batch's worst-case Pesepay round trips.
+LEASE = timedelta(minutes=5)
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(minutes=30)
+
+
+def next_attempt_delay(attempts):
+    return min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+
+
+def due_payments(now):
+    return (
+        Payment.objects.filter(
+            status__in=RECONCILE_STATUSES,
+            reference_number__isnull=False,
+            created_at__lte=now - MIN_AGE,
+            created_at__gte=now - MAX_AGE,
+        )
+        .exclude(payment_method='CASH001')
+        .filter(Q(next_reconcile_at__isnull=True) | Q(next_reconcile_at__lte=now))
+    )
+
+
+def claim_batch(batch_size):
+    """
+    Lock up to `batch_size` due payments, lease them to this worker, and
+    return them. Rows another worker holds locked are skipped.
+    """
+    now = timezone.now()
+    lease_until = now + LEASE
+    with transaction.atomic():
+        payments = list(
+            due_payments(now)
+            .select_for_update(skip_locked=True)
+            .order_by('next_reconcile_at', 'created_at')[:batch_size]
+        )
+        if payments:
+            Payment.objects.filter(pk__in=[payment.pk for payment in payments]).update(
+                next_reconcile_at=lease_until,
+            )
+    for payment in payments:
+        payment.next_reconcile_at = lease_until
+    return payments
+
+
+def _fetch(reference_number):
+    try:
+        return get_gateway().get_transaction_by_reference(reference_number), None
+    except Exception as exc:
+        return None, exc
+
+
+def fetch_statuses(payments, concurrency):
+    """Query Pesepay for every payment, at most `concurrency` at a time."""
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='reconcile') as pool:
+        results = pool.map(_fetch, [payment.reference_number for payment in payments])
+        return list(zip(payments, results))
+
+
+def apply_result(payment, data, error):
+    """Apply one Pesepay lookup to `payment` and schedule its next attempt."""
+    now = timezone.now()
+    attempts = payment.reconcile_attempts + 1
+    next_reconcile_at = now + next_attempt_delay(attempts)
+    if error is not None:
+        logger.warning(f"Reconciliation lookup failed for {payment.reference_number}: {error}")
+        Payment.objects.filter(pk=payment.pk).update(
+            reconcile_attempts=attempts,
+            next_reconcile_at=next_reconcile_at,
+        )
+        return False
+
+    with transaction.atomic():
+        # The claimed instance is as old as the lookup; re-read it under lock.
+        payment = Payment.objects.select_for_update().filter(pk=payment.pk).first()
+        if payment is None:
+            return False
+        if payment.status not in Payment.FINAL_STATUSES:
+            # The by-reference endpoint reports the status as `transactionStatus`.
+            payment.update_from_pesepay_response({**data, 'status': data.get('transactionStatus', '')})
+        Payment.objects.filter(pk=payment.pk).update(
+            reconcile_attempts=attempts,
+            next_reconcile_at=None if payment.status in Payment.FINAL_STATUSES else next_reconcile_at,
+        )
+    return True
+
+
+def reconcile_batch(batch_size=50, concurrency=8):
+    """
+    Claim, look up and update one batch. Returns `(claimed, updated)` where
+    `updated` counts payments whose lookup succeeded.
+    """
+    payments = claim_batch(batch_size)
+    if not payments:
+        return 0, 0
+    updated = 0
+    for payment, (data, error) in fetch_statuses(payments, concurrency):
+        try:
+            updated += apply_result(payment, data, error)
+        except Exception:
+            logger.exception(f"Failed to apply reconciliation result for payment {payment.pk}")
+    return len(payments), updated
@@ -1,8 +1,11 @@
 # payments/signals.py
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import Payment
 from albums.models import PlaquePurchase
+from .status import forget_final_responses
+from .broadcast import publish_status_change, status_event
 
 @receiver(post_save, sender=Payment)
 def update_plaque_purchase_on_payment(sender, instance, **kwargs):
@@ -10,12 +13,24 @@ def update_plaque_purchase_on_payment(sender, instance, **kwargs):
         try:
             purchase = PlaquePurchase.objects.get(transaction_id=instance.reference_number)
             purchase.payment_status = "COMPLETED"
-
-            # Update plaque type dynamically
-            plaque_type = purchase.get_plaque_type(purchase.contribution_amount)
-            purchase.plaque.plaque_type = plaque_type
-            purchase.plaque.save()
-
+            # PlaquePurchase.save() keeps the plaque tier in step with the amount.
             purchase.save()
         except PlaquePurchase.DoesNotExist:
             pass
+
+
+@receiver(post_save, sender=Payment)
+def forget_cached_final_status(sender, instance, **kwargs):
+    # A final status can still be corrected (e.g. cash COLLECTED → DELIVERED);
+    # the next status poll re-caches the fresh response.
+    forget_final_responses(instance.reference_number)
+
+
+@receiver(post_save, sender=Payment)
+def broadcast_status_change(sender, instance, **kwargs):
+    if instance.status == getattr(instance, '_loaded_status', None):
+        return
+    instance._loaded_status = instance.status
+    event = status_event(instance.reference_number, instance.status)
+    # Only announce what other connections can already read.
+    transaction.on_commit(lambda: publish_status_change(event))
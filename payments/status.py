@@ -0,0 +1,123 @@
+"""
+Payment status polling.
+
+Browsers poll `/api/payments/status/<reference_number>/` every few seconds
+while a payment is open, often from several tabs at once. Two caches keep
+that traffic off Pesepay and the database:
+
+* Responses for payments in a final status are cached by reference, so they
+  are answered without touching the database.
+* Pesepay's latest answer for an open payment is cached for
+  `PAYMENT_STATUS_POLL_INTERVAL` seconds. Concurrent polls for the same
+  reference are coalesced into one upstream request: within a process,
+  followers wait for the leader's result; across processes, a `cache.add`
+  lock held for the interval lets exactly one process call Pesepay while the
+  rest wait for its answer to appear in the cache.
+
+Upstream calls therefore drop to at most one per reference per interval.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .gateway import get_gateway
+
+FINAL_RESPONSE_KEY = 'payments:status:final:{reference_number}'
+UPSTREAM_KEY = 'payments:status:upstream:{reference_number}'
+UPSTREAM_LOCK_KEY = 'payments:status:upstream-lock:{reference_number}'
+
+# Seconds to wait for another process's upstream answer before falling back
+# to the stored status.
+UPSTREAM_WAIT = 5
+UPSTREAM_WAIT_STEP = 0.1
+
+
+def get_final_response(reference_number):
+    return cache.get(FINAL_RESPONSE_KEY.format(reference_number=reference_number))
+
+
+def remember_final_response(reference_number, payload):
+    cache.set(
+        FINAL_RESPONSE_KEY.format(reference_number=reference_number),
+        payload, timeout=settings.PAYMENT_FINAL_STATUS_CACHE_TIMEOUT,
+    )
+
+
+def forget_final_responses(*reference_numbers):
+    """Drop cached final responses, e.g. after a final status was changed by hand."""
+    cache.delete_many([
+        FINAL_RESPONSE_KEY.format(reference_number=reference_number)
+        for reference_number in reference_numbers if reference_number
+    ])
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _wait_for_upstream(key):
+    deadline = time.monotonic() + UPSTREAM_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(UPSTREAM_WAIT_STEP)
+        data = cache.get(key)
+        if data is not None:
+            return data
+    return None
+
+
+def _fetch_upstream(reference_number):
+    key = UPSTREAM_KEY.format(reference_number=reference_number)
+    interval = settings.PAYMENT_STATUS_POLL_INTERVAL
+    # The lock is left to expire rather than released, which is what limits
+    # Pesepay to one call per reference per interval, even after a failure.
+    if not cache.add(UPSTREAM_LOCK_KEY.format(reference_number=reference_number), 1, timeout=interval):
+        return _wait_for_upstream(key)
+    data = get_gateway().get_transaction_by_reference(reference_number)
+    cache.set(key, data, timeout=interval)
+    return data
+
+
+def latest_upstream_status(reference_number):
+    """
+    Return Pesepay's transaction JSON for `reference_number`, at most
+    `PAYMENT_STATUS_POLL_INTERVAL` seconds old.
+
+    Returns None when another process holds the upstream lock and its answer
+    did not arrive in time; callers should then report the stored status.
+    Raises whatever the upstream request raised, to every coalesced caller.
+    """
+    data = cache.get(UPSTREAM_KEY.format(reference_number=reference_number))
+    if data is not None:
+        return data
+
+    with _flights_lock:
+        flight = _flights.get(reference_number)
+        leader = flight is None
+        if leader:
+            flight = _flights[reference_number] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = _fetch_upstream(reference_number)
+        return flight.result
+    except Exception as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[reference_number]
+        flight.done.set()
@@ -0,0 +1,145 @@
+"""
+Streaming payment status endpoints.
+
+These are plain async Django views, served by the ASGI application in
+`backend/asgi.py` (the `stream` process in the Procfile; the proxy routes
+`/api/payments/status/<ref>/events/` to it). A waiting client is a suspended
+coroutine and one queue, not a worker, so one process can hold thousands of
+them. Status changes arrive from every process through Redis, see
+`payments.broadcast`.
+
+* Server-Sent Events: `GET /api/payments/status/<ref>/events/` with
+  `Accept: text/event-stream` (what `EventSource` sends). Sends the current
+  status, then one `status` event per change, and closes once the status is
+  final or after `STREAM_MAX_SECONDS`; `EventSource` reconnects on its own.
+* Long poll: the same URL without that Accept header, or with `?mode=poll`.
+  Returns as soon as the status differs from `?since=<status>` (immediately
+  when `since` is omitted or the status is final), or the unchanged status
+  after `LONG_POLL_SECONDS`.
+
+Streaming needs both ASGI and `REDIS_URL`. Under WSGI the whole response is
+collected before any of it is sent and every waiting client holds a sync
+worker, and without Redis changes saved by the WSGI processes never reach
+the stream. In either case SSE requests get a 501 and long polls get the
+current status straight away, like the plain status poll.
+"""
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .broadcast import hub, status_event
+from .models import Payment
+
+STREAM_MAX_SECONDS = 300
+LONG_POLL_SECONDS = 25
+# Changes arrive through Redis; a recheck only guards against a missed message.
+RECHECK_SECONDS = 15
+
+
+async def _current_event(reference_number):
+    status = await (
+        Payment.objects.filter(reference_number=reference_number)
+        .values_list('status', flat=True)
+        .afirst()
+    )
+    if status is None:
+        return None
+    return status_event(reference_number, status)
+
+
+async def _next_change(reference_number, queue, current, timeout):
+    """
+    Wait up to `timeout` seconds for a status other than `current['status']`.
+    Returns the new event, `current` on timeout, or None if the payment is gone.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while (remaining := deadline - loop.time()) > 0:
+        try:
+            event = await asyncio.wait_for(queue.get(), timeout=min(remaining, RECHECK_SECONDS))
+        except asyncio.TimeoutError:
+            event = await _current_event(reference_number)
+            if event is None:
+                return None
+        if event['status'] != current['status']:
+            return event
+    return current
+
+
+def _sse(event_name, data):
+    return f"event: {event_name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _event_stream(reference_number):
+    # Subscribe before reading the status so a change in between is not lost.
+    queue = hub.subscribe(reference_number)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_MAX_SECONDS
+    try:
+        current = await _current_event(reference_number)
+        if current is None:
+            return
+        yield "retry: 3000\n\n"
+        yield _sse('status', current)
+        while not current['is_final_status']:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            event = await _next_change(reference_number, queue, current, min(remaining, RECHECK_SECONDS))
+            if event is None:
+                break
+            if event is current:
+                # Comment line: keeps proxies from timing out an idle stream.
+                yield ": keepalive\n\n"
+                continue
+            current = event
+            yield _sse('status', current)
+    finally:
+        hub.unsubscribe(reference_number, queue)
+
+
+async def _long_poll(reference_number, since):
+    queue = hub.subscribe(reference_number)
+    try:
+        current = await _current_event(reference_number)
+        if current is not None and since == current['status'] and not current['is_final_status']:
+            current = await _next_change(reference_number, queue, current, LONG_POLL_SECONDS)
+        return current
+    finally:
+        hub.unsubscribe(reference_number, queue)
+
+
+def _can_stream(request):
+    return isinstance(request, ASGIRequest) and bool(settings.REDIS_URL)
+
+
+async def payment_status_stream(request, reference_number):
+    accept = request.headers.get('Accept', '')
+    wants_events = request.GET.get('mode') != 'poll' and 'text/event-stream' in accept
+    if not _can_stream(request):
+        if wants_events:
+            return JsonResponse(
+                {"success": False, "error": "Status streaming is not available here; poll the status instead"},
+                status=501,
+            )
+        current = await _current_event(reference_number)
+        if current is None:
+            return JsonResponse({"success": False, "error": "Payment not found"}, status=404)
+        return JsonResponse({"success": True, **current})
+
+    if not wants_events:
+        current = await _long_poll(reference_number, request.GET.get('since'))
+        if current is None:
+            return JsonResponse({"success": False, "error": "Payment not found"}, status=404)
+        return JsonResponse({"success": True, **current})
+
+    if await _current_event(reference_number) is None:
+        return JsonResponse({"success": False, "error": "Payment not found"}, status=404)
+    response = StreamingHttpResponse(_event_stream(reference_number), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
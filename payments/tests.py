@@ -1,3 +1,67 @@
-from django.test import TestCase
+import asyncio
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .broadcast import StatusHub, hub
+from .models import Payment
+
+
+async def _no_listener(self):
+    return
+
+
+class PaymentStatusStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(
+            email='fan@example.com', username='fan', password='secret', first_name='Fan', last_name='One',
+        )
+        cls.payment = Payment.objects.create(
+            user=user, reference_number='REF-STREAM-1', amount=Decimal('5.00'), payment_method='PZW211',
+            payment_reason='Album support', customer_email='fan@example.com', payment_type='REDIRECT',
+        )
+        cls.url = reverse('payment-status-stream', args=[cls.payment.reference_number])
+
+    def _set_status(self, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = Payment.objects.get(pk=self.payment.pk)
+            payment.status = status
+            payment.save()
+
+    def test_sse_is_refused_under_wsgi(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 501)
+
+    def test_long_poll_answers_at_once_under_wsgi(self):
+        response = self.client.get(self.url, {'since': 'INITIATED'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'INITIATED')
+
+    @override_settings(REDIS_URL='redis://status-stream-test')
+    async def test_sse_delivers_committed_status_change(self):
+        loop = asyncio.get_running_loop()
+
+        def publish(channel, message):
+            # Stands in for Redis pub/sub: hand the message to this process's hub.
+            loop.call_soon_threadsafe(hub.dispatch, json.loads(message))
+
+        with mock.patch('payments.broadcast._redis', return_value=mock.Mock(publish=publish)), \
+                mock.patch.object(StatusHub, '_listen', _no_listener):
+            response = await self.async_client.get(self.url, headers={'Accept': 'text/event-stream'})
+            self.assertEqual(response.status_code, 200)
+            stream = aiter(response.streaming_content)
+            self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+            self.assertIn(b'"status": "INITIATED"', await anext(stream))
+
+            await sync_to_async(self._set_status)('SUCCESS')
+            event = await asyncio.wait_for(anext(stream), timeout=5)
+            self.assertIn(b'"status": "SUCCESS"', event)
+            self.assertIn(b'"paid": true', event)
+            with self.assertRaises(StopAsyncIteration):
+                await asyncio.wait_for(anext(stream), timeout=5)
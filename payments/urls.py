@@ -1,5 +1,6 @@
 from django.urls import path
 from .views import *
+from .streams import payment_status_stream
 
 urlpatterns = [
     # Payment creation
@@ -8,14 +9,17 @@ urlpatterns = [
     
     # Payment status and details I am using these
     path('payments/status/<str:reference_number>/', CheckPaymentStatusView.as_view(), name='check-payment-status'),
+    path('payments/status/<str:reference_number>/events/', payment_status_stream, name='payment-status-stream'),
     path('payments/user/', UserPaymentsView.as_view(), name='user-payments'),
     path('payments/detail/<uuid:payment_id>/', PaymentDetailView.as_view(), name='payment-detail'),
+    path('payments/detail/<uuid:payment_id>/logs/', PaymentLogHistoryView.as_view(), name='payment-log-history'),
      path('to-be-verified/', MarkPaymentToBeVerifiedView.as_view(), name='to_be_verified_payment'),
     
     # Pesepay callbacks
     path('payments/return/', PaymentReturnView.as_view(), name='payment-return'),
     path('payments/result/', PaymentResultView.as_view(), name='payment-result'),
     path('dashboard/payments/', UserDashboardAPIView.as_view(), name='user-dashboard-payments'),
+    path('payments/gateway/latency/', PesepayLatencyView.as_view(), name='pesepay-latency'),
     
     # Legacy endpoints (for backward compatibility)
     path('payments/create-payment/', CreateSeamlessPaymentView.as_view(), name='create-payment-legacy'),
@@ -7,7 +7,7 @@ from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 import requests
 import json
 from django.http import JsonResponse
@@ -17,15 +17,14 @@ from .serializers import *
 from django.db import transaction
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from pesepay import Pesepay
+from .gateway import get_gateway, latency_snapshot
+from .status import get_final_response, latest_upstream_status, remember_final_response
+from .eventlog import PaymentEventBuffer, log_payment_event, summarize_request
+from .archive import archived_logs_for
+from .callbacks import callback_processor, record_callback, requeue_unmatched
+from .initiation import record_failure, record_initiated, reserve_payment
 logger = logging.getLogger(__name__)
 
-
-# Initialize Pesepay
-pesepay = Pesepay( settings.PESEPAY_ENCRYPTION_KEY,settings.PESEPAY_INTEGRATION_KEY,)
-pesepay.result_url = settings.PESEPAY_RESULT_URL
-pesepay.return_url = settings.PESEPAY_RETURN_URL
-
 class CreateSeamlessPaymentView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -35,147 +34,116 @@ class CreateSeamlessPaymentView(APIView):
         user = request.user
         
         try:
-            with transaction.atomic():
-                # Create payment record first WITHOUT reference_number
-                payment_record = Payment.objects.create(
-                    user=user,
-                    amount=data.get('amount'),
-                    currency=data.get('currency_code', 'USD'),
-                    payment_method=data.get('payment_method_code'),
-                    payment_reason=data.get('payment_reason'),
-                    customer_email=data.get('email', user.email),
-                    customerPhoneNumber=data.get('phone_number', ''),
-                    customer_name=data.get('customer_name', f"{user.first_name} {user.last_name}".strip()),
-                    payment_type='SEAMLESS',
-                    required_fields=data.get('required_fields', {}),
-                    # Support-specific fields
-                    album_title=data.get('album_title'),
-                    artist_name=data.get('artist_name'),
-                    plaque_type=data.get('plaque_type'),
-                    # Don't set reference_number yet - it will come from Pesepay
+            # Phase 1: reserve the payment record (no reference_number until Pesepay gives one)
+            payment_record = reserve_payment(
+                'Seamless payment record created',
+                summarize_request(data),
+                user=user,
+                amount=data.get('amount'),
+                currency=data.get('currency_code', 'USD'),
+                payment_method=data.get('payment_method_code'),
+                payment_reason=data.get('payment_reason'),
+                customer_email=data.get('email', user.email),
+                customerPhoneNumber=data.get('phone_number', ''),
+                customer_name=data.get('customer_name', f"{user.first_name} {user.last_name}".strip()),
+                payment_type='SEAMLESS',
+                required_fields=data.get('required_fields', {}),
+                # Support-specific fields
+                album_title=data.get('album_title'),
+                artist_name=data.get('artist_name'),
+                plaque_type=data.get('plaque_type'),
+            )
+            
+            logger.info(f"Created payment record with ID: {payment_record.id}")
+            logger.info(f"Creating Pesepay payment with parameters:")
+            logger.info(f"  currency: {payment_record.currency}")
+            logger.info(f"  payment_method: {payment_record.payment_method}")
+            logger.info(f"  email: {payment_record.customer_email}")
+            logger.info(f"  phone: {payment_record.customerPhoneNumber}")
+            logger.info(f"  name: {payment_record.customer_name}")
+
+            # Phase 2: talk to Pesepay with no transaction open
+            try:
+                # Create Pesepay payment using positional arguments
+                payment = get_gateway().create_payment(
+                    payment_record.currency,
+                    payment_record.payment_method,
+                    payment_record.customer_email,
+                    payment_record.customerPhoneNumber,
+                    payment_record.customer_name
                 )
-                
-                # Log payment creation
-                PaymentLog.objects.create(
-                    payment=payment_record,
-                    event_type='CREATED',
-                    message='Seamless payment record created',
-                    data=data
+                payment.merchantReference = payment_record.pesepay_merchant_reference
+                logger.info(f"Pesepay payment created successfully")
+            except Exception as e:
+                logger.error(f"Failed to create Pesepay payment: {str(e)}")
+                record_failure(
+                    payment_record, 'PESEPAY_CREATE_FAILED',
+                    f'Failed to create Pesepay payment: {str(e)}',
+                    {'error': str(e), 'error_type': type(e).__name__},
                 )
-                
-                logger.info(f"Created payment record with ID: {payment_record.id}")
-                logger.info(f"Creating Pesepay payment with parameters:")
-                logger.info(f"  currency: {payment_record.currency}")
-                logger.info(f"  payment_method: {payment_record.payment_method}")
-                logger.info(f"  email: {payment_record.customer_email}")
-                logger.info(f"  phone: {payment_record.customerPhoneNumber}")
-                logger.info(f"  name: {payment_record.customer_name}")
-
-                try:
-                    # Create Pesepay payment using positional arguments
-                    payment = pesepay.create_payment(
-                        payment_record.currency,
-                        payment_record.payment_method,
-                        payment_record.customer_email,
-                        payment_record.customerPhoneNumber,
-                        payment_record.customer_name
-                    )
-                    logger.info(f"Pesepay payment created successfully")
-                except Exception as e:
-                    logger.error(f"Failed to create Pesepay payment: {str(e)}")
-                    # Mark payment as failed and log the error
-                    payment_record.mark_as_failed()
-                    PaymentLog.objects.create(
-                        payment=payment_record,
-                        event_type='PESEPAY_CREATE_FAILED',
-                        message=f'Failed to create Pesepay payment: {str(e)}',
-                        data={'error': str(e), 'error_type': type(e).__name__}
-                    )
-                    raise
-                
-                # Process required fields
-                required_fields = data.get('required_fields', {})
-                if not required_fields:
-                    required_fields = {'default': 'value'}
-                
+                raise
+            
+            # Process required fields
+            required_fields = data.get('required_fields', {})
+            if not required_fields:
+                required_fields = {'default': 'value'}
+            
+            try:
+                # Make seamless payment
+                response = get_gateway().make_seamless_payment(
+                    payment, 
+                    payment_record.payment_reason, 
+                    float(payment_record.amount), 
+                    required_fields
+                )
+                logger.info(f"Pesepay seamless payment response: success={response.success}")
+            except Exception as e:
+                logger.error(f"Failed to make seamless payment: {str(e)}")
+                record_failure(
+                    payment_record, 'PESEPAY_SEAMLESS_FAILED',
+                    f'Failed to make seamless payment: {str(e)}',
+                    {'error': str(e), 'error_type': type(e).__name__},
+                )
+                raise
+            
+            # Phase 3: record the outcome
+            if response.success:
                 try:
-                    # Make seamless payment
-                    response = pesepay.make_seamless_payment(
-                        payment, 
-                        payment_record.payment_reason, 
-                        float(payment_record.amount), 
-                        required_fields
-                    )
-                    logger.info(f"Pesepay seamless payment response: success={response.success}")
-                except Exception as e:
-                    logger.error(f"Failed to make seamless payment: {str(e)}")
-                    payment_record.mark_as_failed()
-                    PaymentLog.objects.create(
-                        payment=payment_record,
-                        event_type='PESEPAY_SEAMLESS_FAILED',
-                        message=f'Failed to make seamless payment: {str(e)}',
-                        data={'error': str(e), 'error_type': type(e).__name__}
-                    )
-                    raise
-                
-                if response.success:
-                    # Update payment record with Pesepay response
-                    payment_record.reference_number = response.referenceNumber
-                    payment_record.poll_url = response.pollUrl
-                    if hasattr(response, 'redirectUrl'):
-                        payment_record.redirect_url = response.redirectUrl
-                    
-                    # Save the updated payment record
-                    try:
-                        payment_record.save(update_fields=['reference_number', 'poll_url', 'redirect_url', 'updated_at'])
-                        logger.info(f"Updated payment record with reference: {response.referenceNumber}")
-                    except Exception as e:
-                        logger.error(f"Failed to save payment record: {str(e)}")
-                        # If we can't save the reference number, still try to continue
-                        # but log the issue
-                        PaymentLog.objects.create(
-                            payment=payment_record,
-                            event_type='SAVE_ERROR',
-                            message=f'Failed to save reference number: {str(e)}',
-                            data={'reference_number': response.referenceNumber, 'error': str(e)}
-                        )
-                    
-                    # Log successful creation
-                    PaymentLog.objects.create(
-                        payment=payment_record,
-                        event_type='PESEPAY_SUCCESS',
-                        message='Pesepay seamless payment initiated successfully',
-                        data={
+                    record_initiated(
+                        payment_record, response,
+                        'Pesepay seamless payment initiated successfully',
+                        {
                             'reference_number': response.referenceNumber,
                             'poll_url': response.pollUrl
-                        }
-                    )
-                    
-                    return Response({
-                        'success': True,
-                        'payment_id': str(payment_record.id),
-                        'reference_number': response.referenceNumber,
-                        'poll_url': response.pollUrl,
-                        'redirect_url': getattr(response, 'redirectUrl', None),
-                        'message': 'Payment initiated successfully'
-                    }, status=status.HTTP_201_CREATED)
-                else:
-                    # Mark payment as failed
-                    payment_record.mark_as_failed()
-                    
-                    # Log failure
-                    PaymentLog.objects.create(
-                        payment=payment_record,
-                        event_type='PESEPAY_FAILED',
-                        message=f'Pesepay seamless payment failed: {response.message}',
-                        data={'error_message': response.message}
+                        },
                     )
-                    
-                    return Response({
-                        'success': False,
-                        'message': response.message,
-                        'payment_id': str(payment_record.id)
-                    }, status=status.HTTP_400_BAD_REQUEST)
+                    logger.info(f"Updated payment record with reference: {response.referenceNumber}")
+                    requeue_unmatched(response.referenceNumber)
+                except Exception:
+                    # Pesepay has the payment, so still hand it to the client; the
+                    # result callback's merchant reference recovers the record.
+                    logger.exception(f"Failed to record reference {response.referenceNumber} for payment {payment_record.id}")
+                
+                return Response({
+                    'success': True,
+                    'payment_id': str(payment_record.id),
+                    'reference_number': response.referenceNumber,
+                    'poll_url': response.pollUrl,
+                    'redirect_url': getattr(response, 'redirectUrl', None),
+                    'message': 'Payment initiated successfully'
+                }, status=status.HTTP_201_CREATED)
+            else:
+                record_failure(
+                    payment_record, 'PESEPAY_FAILED',
+                    f'Pesepay seamless payment failed: {response.message}',
+                    {'error_message': response.message},
+                )
+                
+                return Response({
+                    'success': False,
+                    'message': response.message,
+                    'payment_id': str(payment_record.id)
+                }, status=status.HTTP_400_BAD_REQUEST)
                     
         except Exception as e:
             logger.exception("Error in CreateSeamlessPaymentView")
@@ -193,126 +161,100 @@ class InitiateRedirectPaymentView(APIView):
         user = request.user
         
         try:
-            with transaction.atomic():
-                # Create payment record WITHOUT reference_number
-                payment_record = Payment.objects.create(
-                    user=user,
-                    amount=data.get('amount'),
-                    currency=data.get('currency_code', 'USD'),
-                    payment_method=data.get('payment_method_code', 'REDIRECT'),
-                    payment_reason=data.get('payment_reason'),
-                    customer_email=data.get('email', user.email),
-                    customerPhoneNumber=data.get('customerPhoneNumber', ''),
-                    customer_name=data.get('customer_name', f"{user.first_name} {user.last_name}".strip()),
-                    payment_type='REDIRECT',
-                    # Support-specific fields
-                    album_title=data.get('album_title'),
-                    artist_name=data.get('artist_name'),
-                    plaque_type=data.get('plaque_type'),
-                    # Don't set reference_number yet
+            # Phase 1: reserve the payment record (no reference_number until Pesepay gives one)
+            payment_record = reserve_payment(
+                'Redirect payment record created',
+                summarize_request(data),
+                user=user,
+                amount=data.get('amount'),
+                currency=data.get('currency_code', 'USD'),
+                payment_method=data.get('payment_method_code', 'REDIRECT'),
+                payment_reason=data.get('payment_reason'),
+                customer_email=data.get('email', user.email),
+                customerPhoneNumber=data.get('customerPhoneNumber', ''),
+                customer_name=data.get('customer_name', f"{user.first_name} {user.last_name}".strip()),
+                payment_type='REDIRECT',
+                # Support-specific fields
+                album_title=data.get('album_title'),
+                artist_name=data.get('artist_name'),
+                plaque_type=data.get('plaque_type'),
+            )
+            
+            logger.info(f"Created payment record with ID: {payment_record.id}")
+            logger.info(f"Creating Pesepay transaction with parameters:")
+            logger.info(f"  amount: {payment_record.amount}")
+            logger.info(f"  currency: {payment_record.currency}")
+            logger.info(f"  reason: {payment_record.payment_reason}")
+
+            # Phase 2: talk to Pesepay with no transaction open
+            try:
+                transaction_obj = get_gateway().create_transaction(
+                    float(payment_record.amount),
+                    payment_record.currency,
+                    payment_record.payment_reason,
+                    payment_record.pesepay_merchant_reference,
                 )
-                
-                # Log payment creation
-                PaymentLog.objects.create(
-                    payment=payment_record,
-                    event_type='CREATED',
-                    message='Redirect payment record created',
-                    data=data
+                logger.info(f"Pesepay transaction created successfully")
+            except Exception as e:
+                logger.error(f"Failed to create Pesepay transaction: {str(e)}")
+                record_failure(
+                    payment_record, 'PESEPAY_CREATE_FAILED',
+                    f'Failed to create Pesepay transaction: {str(e)}',
+                    {'error': str(e), 'error_type': type(e).__name__},
                 )
-                
-                logger.info(f"Created payment record with ID: {payment_record.id}")
-                logger.info(f"Creating Pesepay transaction with parameters:")
-                logger.info(f"  amount: {payment_record.amount}")
-                logger.info(f"  currency: {payment_record.currency}")
-                logger.info(f"  reason: {payment_record.payment_reason}")
-
-                try:
-                    transaction_obj = pesepay.create_transaction(
-                        float(payment_record.amount),
-                        payment_record.currency,
-                        payment_record.payment_reason
-                    )
-                    logger.info(f"Pesepay transaction created successfully")
-                except Exception as e:
-                    logger.error(f"Failed to create Pesepay transaction: {str(e)}")
-                    payment_record.mark_as_failed()
-                    PaymentLog.objects.create(
-                        payment=payment_record,
-                        event_type='PESEPAY_CREATE_FAILED',
-                        message=f'Failed to create Pesepay transaction: {str(e)}',
-                        data={'error': str(e), 'error_type': type(e).__name__}
-                    )
-                    raise
-                
+                raise
+            
+            try:
+                # Initiate transaction
+                response = get_gateway().initiate_transaction(transaction_obj)
+                logger.info(f"Pesepay transaction initiation response: success={response.success}")
+            except Exception as e:
+                logger.error(f"Failed to initiate transaction: {str(e)}")
+                record_failure(
+                    payment_record, 'PESEPAY_INITIATE_FAILED',
+                    f'Failed to initiate transaction: {str(e)}',
+                    {'error': str(e), 'error_type': type(e).__name__},
+                )
+                raise
+            
+            # Phase 3: record the outcome
+            if response.success:
                 try:
-                    # Initiate transaction
-                    response = pesepay.initiate_transaction(transaction_obj)
-                    logger.info(f"Pesepay transaction initiation response: success={response.success}")
-                except Exception as e:
-                    logger.error(f"Failed to initiate transaction: {str(e)}")
-                    payment_record.mark_as_failed()
-                    PaymentLog.objects.create(
-                        payment=payment_record,
-                        event_type='PESEPAY_INITIATE_FAILED',
-                        message=f'Failed to initiate transaction: {str(e)}',
-                        data={'error': str(e), 'error_type': type(e).__name__}
-                    )
-                    raise
-                
-                if response.success:
-                    # Update payment record
-                    payment_record.reference_number = response.referenceNumber
-                    payment_record.poll_url = getattr(response, 'pollUrl', None)
-                    payment_record.redirect_url = response.redirectUrl
-                    
-                    try:
-                        payment_record.save(update_fields=['reference_number', 'poll_url', 'redirect_url', 'updated_at'])
-                        logger.info(f"Updated payment record with reference: {response.referenceNumber}")
-                    except Exception as e:
-                        logger.error(f"Failed to save payment record: {str(e)}")
-                        PaymentLog.objects.create(
-                            payment=payment_record,
-                            event_type='SAVE_ERROR',
-                            message=f'Failed to save reference number: {str(e)}',
-                            data={'reference_number': response.referenceNumber, 'error': str(e)}
-                        )
-                    
-                    # Log successful initiation
-                    PaymentLog.objects.create(
-                        payment=payment_record,
-                        event_type='PESEPAY_SUCCESS',
-                        message='Pesepay redirect payment initiated successfully',
-                        data={
+                    record_initiated(
+                        payment_record, response,
+                        'Pesepay redirect payment initiated successfully',
+                        {
                             'reference_number': response.referenceNumber,
                             'redirect_url': response.redirectUrl
-                        }
+                        },
                     )
-                    
-                    return Response({
-                        'success': True,
-                        'payment_id': str(payment_record.id),
-                        'reference_number': response.referenceNumber,
-                        'redirect_url': response.redirectUrl,
-                        'poll_url': getattr(response, 'pollUrl', None),
-                        'message': 'Payment initiated successfully'
-                    }, status=status.HTTP_201_CREATED)
-                else:
-                    # Mark payment as failed
-                    payment_record.mark_as_failed()
-                    
-                    # Log failure
-                    PaymentLog.objects.create(
-                        payment=payment_record,
-                        event_type='PESEPAY_FAILED',
-                        message=f'Pesepay redirect payment failed: {response.message}',
-                        data={'error_message': response.message}
-                    )
-                    
-                    return Response({
-                        'success': False,
-                        'message': response.message,
-                        'payment_id': str(payment_record.id)
-                    }, status=status.HTTP_400_BAD_REQUEST)
+                    logger.info(f"Updated payment record with reference: {response.referenceNumber}")
+                    requeue_unmatched(response.referenceNumber)
+                except Exception:
+                    # Pesepay has the payment, so still hand it to the client; the
+                    # result callback's merchant reference recovers the record.
+                    logger.exception(f"Failed to record reference {response.referenceNumber} for payment {payment_record.id}")
+                
+                return Response({
+                    'success': True,
+                    'payment_id': str(payment_record.id),
+                    'reference_number': response.referenceNumber,
+                    'redirect_url': response.redirectUrl,
+                    'poll_url': getattr(response, 'pollUrl', None),
+                    'message': 'Payment initiated successfully'
+                }, status=status.HTTP_201_CREATED)
+            else:
+                record_failure(
+                    payment_record, 'PESEPAY_FAILED',
+                    f'Pesepay redirect payment failed: {response.message}',
+                    {'error_message': response.message},
+                )
+                
+                return Response({
+                    'success': False,
+                    'message': response.message,
+                    'payment_id': str(payment_record.id)
+                }, status=status.HTTP_400_BAD_REQUEST)
                     
         except Exception as e:
             logger.exception("Error in InitiateRedirectPaymentView")
@@ -335,16 +277,18 @@ logger = logging.getLogger(__name__)
 
 class CheckPaymentStatusView(APIView):
     permission_classes = [AllowAny]  # Allow checking status without authentication
+    # Polled every few seconds: skip cookie/JWT auth so a cached final status never touches the DB.
+    authentication_classes = []
 
-    FINAL_STATUSES = [
-        "AUTHORIZATION_FAILED", "CANCELLED", "CLOSED", "CLOSED_PERIOD_ELAPSED",
-        "DECLINED", "ERROR", "FAILED", "INSUFFICIENT_FUNDS", "REVERSED",
-        "SERVICE_UNAVAILABLE", "SUCCESS", "TERMINATED", "TIME_OUT",
-        "COLLECTED", "DELIVERED"
-    ]
+    FINAL_STATUSES = Payment.FINAL_STATUSES
 
     def get(self, request, reference_number):
         try:
+            # 🟣 0. Final statuses are served straight from the cache
+            cached = get_final_response(reference_number)
+            if cached is not None:
+                return Response(cached, status=status.HTTP_200_OK)
+
             payment_record = get_object_or_404(Payment, reference_number=reference_number)
 
             # 🟢 1. Handle Cash Payments — skip Pesepay
@@ -355,16 +299,11 @@ class CheckPaymentStatusView(APIView):
             if payment_record.status in self.FINAL_STATUSES:
                 return self._build_response(payment_record)
 
-            # 🔵 3. Otherwise, query PesePay for latest status
-            url = "https://api.pesepay.com/api/payments-engine/v1/transactions/by-reference"
-            headers = {
-                "authorization": settings.PESEPAY_INTEGRATION_KEY,
-                "content-type": "application/json"
-            }
-            params = {"referenceNumber": reference_number}
-            pesepay_resp = requests.get(url, headers=headers, params=params)
-            pesepay_resp.raise_for_status()
-            data = pesepay_resp.json()
+            # 🔵 3. Otherwise, ask PesePay for the latest status (shared by concurrent polls)
+            data = latest_upstream_status(reference_number)
+            if data is None:
+                # Another worker's lookup is still in flight; report what we have.
+                return self._build_response(payment_record)
             logger.info(f"Pesepay transaction response: {data}")
 
             # Map transactionStatus to Payment.status
@@ -377,20 +316,21 @@ class CheckPaymentStatusView(APIView):
             else:
                 payment_record.status = "ERROR"
 
-            # Handle completed timestamp
-            if payment_record.status == "SUCCESS":
-                payment_record.completed_at = timezone.now()
-            elif payment_record.status in [
-                "FAILED", "CANCELLED", "TIME_OUT", "DECLINED", "AUTHORIZATION_FAILED",
-                "CLOSED", "CLOSED_PERIOD_ELAPSED", "INSUFFICIENT_FUNDS",
-                "ERROR", "TERMINATED"
-            ]:
-                payment_record.completed_at = None
+            # Coalesced polls all see the same answer; only the first one writes it.
+            if old_status != payment_record.status:
+                # Handle completed timestamp
+                if payment_record.status == "SUCCESS":
+                    payment_record.completed_at = timezone.now()
+                elif payment_record.status in [
+                    "FAILED", "CANCELLED", "TIME_OUT", "DECLINED", "AUTHORIZATION_FAILED",
+                    "CLOSED", "CLOSED_PERIOD_ELAPSED", "INSUFFICIENT_FUNDS",
+                    "ERROR", "TERMINATED"
+                ]:
+                    payment_record.completed_at = None
 
-            payment_record.save()
+                payment_record.save()
 
-            if old_status != payment_record.status:
-                PaymentLog.objects.create(
+                log_payment_event(
                     payment=payment_record,
                     event_type="STATUS_UPDATE",
                     message=f"Status changed from {old_status} → {payment_record.status}",
@@ -399,8 +339,9 @@ class CheckPaymentStatusView(APIView):
 
             return self._build_response(payment_record)
 
-        except requests.HTTPError as e:
-            logger.error(f"Pesepay API HTTP error: {str(e)}")
+        except requests.RequestException as e:
+            # HTTP errors, timeouts and connection failures after retries.
+            logger.error(f"Pesepay API error: {str(e)}")
             return Response({"success": False, "error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
         except Exception as e:
             logger.exception("Error in CheckPaymentStatusView")
@@ -408,7 +349,7 @@ class CheckPaymentStatusView(APIView):
 
     def _build_response(self, payment_record):
         """Helper to format the response consistently"""
-        return Response({
+        payload = {
             "success": True,
             "paid": payment_record.status in ["SUCCESS", "CashRecorded", "COLLECTED"],  # support cash
             "status": payment_record.status,
@@ -424,7 +365,10 @@ class CheckPaymentStatusView(APIView):
                 "artist_name": payment_record.artist_name,
                 "plaque_type": payment_record.plaque_type,
             },
-        }, status=status.HTTP_200_OK)
+        }
+        if payload["is_final_status"]:
+            remember_final_response(payment_record.reference_number, payload)
+        return Response(payload, status=status.HTTP_200_OK)
 
 class PaymentReturnView(APIView):
     """Handle return from Pesepay payment page"""
@@ -440,7 +384,7 @@ class PaymentReturnView(APIView):
                 payment_record = get_object_or_404(Payment, reference_number=reference_number)
                 
                 # Log return
-                PaymentLog.objects.create(
+                log_payment_event(
                     payment=payment_record,
                     event_type='RETURN',
                     message=f'Payment return received with status: {transaction_status}',
@@ -450,12 +394,23 @@ class PaymentReturnView(APIView):
                     }
                 )
                 
-                # Update status based on transaction status
-                if transaction_status == 'COMPLETED':
-                    payment_record.mark_as_completed()
-                elif transaction_status == 'FAILED':
-                    payment_record.mark_as_failed()
-                
+                # Anyone can call the return URL with any transactionStatus, so
+                # take the status from Pesepay instead of the query string.
+                if payment_record.status not in Payment.FINAL_STATUSES and not reference_number.startswith("CASH-"):
+                    try:
+                        data = latest_upstream_status(reference_number)
+                    except requests.RequestException as e:
+                        logger.warning(f"Pesepay lookup failed on return for {reference_number}: {e}")
+                        data = None
+                    if data is not None:
+                        with transaction.atomic():
+                            payment_record = Payment.objects.select_for_update().get(pk=payment_record.pk)
+                            if payment_record.status not in Payment.FINAL_STATUSES:
+                                # The by-reference endpoint reports the status as `transactionStatus`.
+                                payment_record.update_from_pesepay_response(
+                                    {**data, 'status': data.get('transactionStatus', '')}
+                                )
+
                 return Response({
                     'success': True,
                     'reference_number': reference_number,
@@ -492,29 +447,18 @@ class PaymentResultView(APIView):
         """Handle POST request from Pesepay result URL"""
         try:
             data = request.data if hasattr(request, 'data') else json.loads(request.body)
-            reference_number = data.get('referenceNumber')
+            payload = data.dict() if hasattr(data, 'dict') else dict(data)
+            reference_number = payload.get('referenceNumber')
             
             if reference_number:
-                payment_record = get_object_or_404(Payment, reference_number=reference_number)
-                
-                # Log result
-                PaymentLog.objects.create(
-                    payment=payment_record,
-                    event_type='RESULT',
-                    message='Payment result received from Pesepay',
-                    data=data
-                )
-                
-                # Process result based on status
-                transaction_status = data.get('transactionStatus')
-                if transaction_status == 'COMPLETED':
-                    payment_record.mark_as_completed()
-                elif transaction_status in ['FAILED', 'CANCELLED']:
-                    payment_record.mark_as_failed()
+                # Record only; retries and duplicates collapse onto one inbox row
+                # and the processor applies the result in the background.
+                record_callback(payload)
+                transaction.on_commit(callback_processor.nudge)
                 
                 return Response({
                     'success': True,
-                    'message': 'Result processed successfully'
+                    'message': 'Result received'
                 }, status=status.HTTP_200_OK)
             else:
                 return Response({
@@ -542,6 +486,22 @@ class UserPaymentsView(APIView):
             'payments': serializer.data
         }, status=status.HTTP_200_OK)
 
+class PaymentLogHistoryView(APIView):
+    """A payment's event log (staff only); ?archived=1 also reads archived months"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, payment_id):
+        payment = get_object_or_404(Payment, id=payment_id)
+        logs = list(PaymentLogSerializer(payment.logs.all(), many=True).data)
+        archived = []
+        if request.query_params.get('archived') in ('1', 'true'):
+            archived = archived_logs_for(payment)
+        return Response({
+            'success': True,
+            'logs': logs,
+            'archived_logs': archived,
+        }, status=status.HTTP_200_OK)
+
 class PaymentDetailView(APIView):
     """Get detailed payment information"""
     permission_classes = [IsAuthenticated]
@@ -572,7 +532,7 @@ class CreateCashPaymentView(APIView):
         user = request.user
         
         try:
-            with transaction.atomic():
+            with PaymentEventBuffer() as events:
                 # Validate required fields for cash payments
                 required_fields = ['amount', 'currency', 'customer_email', 'customer_name', 'customer_address']
                 for field in required_fields:
@@ -611,7 +571,7 @@ class CreateCashPaymentView(APIView):
                 payment_record.save()
                 
                 # Log payment creation
-                PaymentLog.objects.create(
+                events.log(
                     payment=payment_record,
                     event_type='CASH_PAYMENT_CREATED',
                     message='Cash payment record created',
@@ -708,7 +668,7 @@ class UpdateCashPaymentStatusView(APIView):
             payment.save()
             
             # Log status change
-            PaymentLog.objects.create(
+            log_payment_event(
                 payment=payment,
                 event_type='CASH_STATUS_UPDATE',
                 message=f'Cash payment status changed from {old_status} to {new_status}',
@@ -856,4 +816,12 @@ class UserDashboardAPIView(APIView):
         return Response({
             "stats": stats,
             "payments": serialized_payments,
-        })
\ No newline at end of file
+        })
+
+
+class PesepayLatencyView(APIView):
+    """Per-operation Pesepay call latency for this process (staff only)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'operations': latency_snapshot()}, status=status.HTTP_200_OK)
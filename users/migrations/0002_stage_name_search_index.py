@@ -0,0 +1,31 @@
+from django.db import migrations
+
+INDEX_NAME = 'users_useraccount_stage_name_search'
+
+
+def create_stage_name_search_index(apps, schema_editor):
+    # Expression GIN indexes are PostgreSQL-only; other databases use the
+    # icontains fallback in albums.search and need no index.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON users_useraccount "
+        "USING gin (to_tsvector('simple'::regconfig, COALESCE(stage_name, '')))"
+    )
+
+
+def drop_stage_name_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_stage_name_search_index, drop_stage_name_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_stage_name_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useraccount',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -72,6 +72,8 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
     # Media
     profile_pic = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
     cover_photo = models.ImageField(upload_to='cover_photos/', null=True, blank=True)
+    # Image field -> file name whose renditions exist; see backend.renditions.
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     
     # Artist-specific fields
     stage_name = models.CharField(max_length=255, null=True, blank=True)
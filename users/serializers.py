@@ -4,6 +4,7 @@ from djoser.serializers import UserCreateSerializer, UserSerializer as BaseUserS
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.utils import timezone
+from backend.renditions import ImageRenditionsField
 
 User = get_user_model()
 
@@ -68,13 +69,16 @@ class CustomUserSerializer(BaseUserSerializer):
     Safely displays user data, computing the user's role on the fly.
     """
     role = serializers.SerializerMethodField(read_only=True)
+    profile_pic_renditions = ImageRenditionsField(source='profile_pic')
+    cover_photo_renditions = ImageRenditionsField(source='cover_photo')
 
     class Meta(BaseUserSerializer.Meta):
         model = User
         fields = (
             'id', 'email', 'username', 'first_name', 'last_name',
             'role', 'is_active', 'is_artist', 'is_producer', 'is_staff','is_fan',
-            'profile_pic', 'cover_photo', 'stage_name', 'genre',
+            'profile_pic', 'cover_photo', 'profile_pic_renditions', 'cover_photo_renditions',
+            'stage_name', 'genre',
             'phone_number', 'whatsapp_number', 'date_of_birth', 'date_joined', 'last_login'
         )
         read_only_fields = ('role', 'date_joined', 'last_login')
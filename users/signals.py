@@ -1,6 +1,12 @@
 from django.contrib.auth import user_logged_in
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 from notifications.models import Notification # Import from your notifications app
+from backend.renditions import changed_image_fields, remember_image_names, schedule_renditions
+from .models import UserAccount
+
+# Image fields that get pre-generated renditions.
+PROFILE_IMAGE_FIELDS = ['profile_pic', 'cover_photo']
 
 @receiver(user_logged_in)
 def check_profile_completeness(sender, request, user, **kwargs):
@@ -27,4 +33,22 @@ def check_profile_completeness(sender, request, user, **kwargs):
                 title='Incomplete Profile',
                 message=f'Please add your {field_name} to complete your profile.',
                 notification_key=f'{profile_warning_key}-{field_key}'
-            )
\ No newline at end of file
+            )
+
+@receiver(post_init, sender=UserAccount)
+def remember_profile_images(sender, instance, **kwargs):
+    """
+    Records loaded image names so that new uploads can be detected on save.
+    """
+    remember_image_names(instance, PROFILE_IMAGE_FIELDS)
+
+
+@receiver(post_save, sender=UserAccount)
+def generate_profile_image_renditions(sender, instance, created, raw=False, **kwargs):
+    """
+    Generates profile and cover photo renditions in the background after upload.
+    """
+    if raw:
+        return
+    schedule_renditions(instance, changed_image_fields(instance, PROFILE_IMAGE_FIELDS, created))
+    remember_image_names(instance, PROFILE_IMAGE_FIELDS)